@@ -1,52 +1,125 @@
 import os
+import threading
 __all__ = ('settings',)
 APP_NAME = os.path.basename(os.path.dirname(__file__))
+class SettingsSnapshot(object):
+    '''
+        immutable namespace of resolved prefixed settings,
+        unknown attributes are looked up in django settings
+    '''
+    __slots__ = ('_django_settings',)
+
+    def __getattr__(self, attr):
+        return getattr(object.__getattribute__(self, '_django_settings'), attr)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError('%s settings are read only'%APP_NAME)
+
+    __delattr__ = __setattr__
+
+
+def snapshot_class(keys):
+    return type('SettingsSnapshot', (SettingsSnapshot,), 
+                {'__slots__': tuple(keys)})
+
+
 class LazySettings(object):
     settings_prefix = APP_NAME.upper()
+    _snapshot = None
+
     def __init__(self):
-        self._settings_loaded = False
+        self._lock = threading.Lock()
+
     def _load_settings(self):
-        self._settings_loaded = True
-        from . import default_settings
-        from django.conf import settings as django_settings
-        self.django_settings = django_settings
-        for key in dir(default_settings):
-            if not key.isupper():
-                continue
-            prefixed_key = '%s_%s'%(self.settings_prefix, key)
-            setattr(self, 
-                    prefixed_key,
-                    getattr(django_settings, 
-                            prefixed_key,
-                            getattr(default_settings, key)))
+        with self._lock:
+            #other thread could load settings while we were waiting
+            if self._snapshot is not None:
+                return self._snapshot
+
+            from . import default_settings
+            from django.conf import settings as django_settings
+            connect_setting_changed(self)
+
+            values = {}
+            for key in dir(default_settings):
+                if not key.isupper():
+                    continue
+                prefixed_key = '%s_%s'%(self.settings_prefix, key)
+                values[prefixed_key] = getattr(django_settings, 
+                                               prefixed_key,
+                                               getattr(default_settings, key))
+
+            snapshot = object.__new__(snapshot_class(values))
+            object.__setattr__(snapshot, '_django_settings', django_settings)
+            for key, value in values.iteritems():
+                object.__setattr__(snapshot, key, value)
+            self._snapshot = snapshot
+            return snapshot
+
+    def _reset(self):
+        with self._lock:
+            self._snapshot = None
+            #drop values cached by __getattr__
+            for key in [key for key in self.__dict__ \
+                            if key.startswith(self.settings_prefix)]:
+                del self.__dict__[key]
+
+    @property
+    def snapshot(self):
+        return self._snapshot or self._load_settings()
 
     def __getattr__(self, attr):
-        if not self._settings_loaded:
-            self._load_settings()
-        
-        return attr in self.__dict__ and\
-               self.__dict__[attr] or\
-               getattr(self.django_settings, attr)
+        snapshot = self._snapshot or self._load_settings()
+        value = getattr(snapshot, attr)
+        #own settings are cached on instance, so later reads skip
+        #__getattr__, django settings stay looked up on each read
+        if attr in type(snapshot).__slots__:
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self.__dict__[attr] = value
+        return value
+
+
+def connect_setting_changed(lazy_settings):
+    try:
+        from django.core.signals import setting_changed
+    except ImportError:
+        try:
+            from django.test.signals import setting_changed
+        except ImportError:
+            #django<1.4 has no way to change settings at runtime
+            return
+
+    def reset_settings(sender, setting, **kwargs):
+        if setting.startswith(lazy_settings.settings_prefix):
+            lazy_settings._reset()
+
+    setting_changed.connect(reset_settings, weak=False,
+                            dispatch_uid='%s_settings_reset_%s'%(APP_NAME,
+                                                    id(lazy_settings)))
 
 settings = LazySettings()
 
-page_module_available = False
-try:
-    from feincms.module.page.models import Page
-    page_module_available = True
-except ImportError:
-    pass
+def raise_warning_if_no_intersection(current, required, setting_name):
+    import warnings
+    unsatisfied = (req for req in required if not req in current)
+    for req in unsatisfied:
+        warnings.warn('settings.%s does not contain `%s` entry, required for `%s` to work correctly'%(setting_name, req, APP_NAME))
 
 
+def register_page_extension():
+    '''
+        registers public_forms extension for feincms Page,
+        called from models.py so importing the package itself
+        does not pull in feincms page module
+    '''
+    try:
+        from feincms.module.page.models import Page
+    except ImportError:
+        return
 
-if page_module_available:
     if not getattr(Page.register_extension, 'warnings_patched', False):
         orig_register_extension = Page.register_extension.__get__(None, Page)
-        import warnings
-        def raise_warning_if_no_intersection(current, required, setting_name):
-            unsatisfied = (req for req in required if not req in current)
-            for req in unsatisfied:
-                warnings.warn('settings.%s does not contain `%s` entry, required for `%s` to work correctly'%(setting_name, req, APP_NAME))
 
         def register_extension(cls, register_fn):
             '''
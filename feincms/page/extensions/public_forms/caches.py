@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+try:
+    from django.core.cache import caches
+except ImportError:
+    #django<1.7
+    from django.core.cache import get_cache
+    caches = None
+
+_backends = {}
+
+
+def get_cache_backend(alias):
+    '''returns django cache backend for alias without creating one per call'''
+    if caches is not None:
+        return caches[alias]
+    try:
+        return _backends[alias]
+    except KeyError:
+        backend = _backends[alias] = get_cache(alias)
+        return backend
+
+
+def freeze(value):
+    '''hashable canonical form of value with nested dicts, lists and sets'''
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze(item) for item in value)
+    return value
+
+
+class BoundedCache(object):
+    '''thread safe process wide mapping, least recently used keys are dropped'''
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            self._data[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,78 @@
+from django.db.models.signals import post_save, post_delete
+from django.contrib.contenttypes.models import ContentType
+
+
+class ContentTypeMap(object):
+    '''
+        process wide model <-> ContentType id map,
+        loaded with one query and dropped when content types change
+    '''
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._loaded = False
+        self._ids = {}
+        self._models = {}
+        self._content_types = {}
+
+    def load(self):
+        ids, models, content_types = {}, {}, {}
+        for content_type in ContentType.objects.all():
+            content_types[content_type.id] = content_type
+            model = content_type.model_class()
+            if model is not None:
+                ids[model] = content_type.id
+                models[content_type.id] = model
+        #readers never see partially filled maps
+        self._ids, self._models, self._content_types = ids, models, content_types
+        self._loaded = True
+
+    def add(self, content_type):
+        model = content_type.model_class()
+        self._content_types[content_type.id] = content_type
+        if model is not None:
+            self._ids[model] = content_type.id
+            self._models[content_type.id] = model
+
+    def normalize_model(self, model):
+        if getattr(model, '_deferred', False):
+            return model._meta.proxy_for_model
+        return model
+
+    def id_for_model(self, model):
+        self._loaded or self.load()
+        model = self.normalize_model(model)
+        try:
+            return self._ids[model]
+        except KeyError:
+            content_type = ContentType.objects.get_for_model(model)
+            self.add(content_type)
+            return content_type.id
+
+    def content_type_for_id(self, content_type_id):
+        self._loaded or self.load()
+        try:
+            return self._content_types[content_type_id]
+        except KeyError:
+            content_type = ContentType.objects.get_for_id(content_type_id)
+            self.add(content_type)
+            return content_type
+
+    def model_for_id(self, content_type_id):
+        try:
+            return self._models[content_type_id]
+        except KeyError:
+            #stale content types have no model
+            return self.content_type_for_id(content_type_id).model_class()
+
+content_types = ContentTypeMap()
+
+
+def clear_content_types(sender, **kwargs):
+    content_types.clear()
+
+post_save.connect(clear_content_types, sender=ContentType,
+                  dispatch_uid='public_forms_content_types_save')
+post_delete.connect(clear_content_types, sender=ContentType,
+                    dispatch_uid='public_forms_content_types_delete')
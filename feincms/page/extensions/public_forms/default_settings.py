@@ -19,4 +19,27 @@ DEFAULT_ENABLE_CAPTCHA_ONCE = True
 DEFAULT_ENABLE_CAPTCHA_ALWAYS = False
 DEFAULT_ENABLE_AJAX = False
 
-AJAX_INIT_TEMPLATE = 'forms/ajax_init.html'
\ No newline at end of file
+AJAX_INIT_TEMPLATE = 'forms/ajax_init.html'
+
+#cache alias for content objects shared between requests, None disables it
+CONTENT_OBJECT_CACHE = None
+CONTENT_OBJECT_CACHE_TIMEOUT = 300
+#cache alias for presentation renders of renderers with cache_presentation,
+#None disables it; fragments are invalidated by saves of public form rows
+#and their objects only, so forms with inline formsets or model choice
+#fields are never cached
+FRAGMENT_CACHE = None
+FRAGMENT_CACHE_TIMEOUT = 300
+#max number of form classes kept between requests
+FORM_CLASS_CACHE_SIZE = 1024
+
+#template widgets share context processors results computed once per request
+#instead of running all processors for every widget, widgets could also
+#declare context_processors they need
+SHARED_WIDGET_CONTEXT = False
+
+#engine of public form and widget templates: 'django', 'jinja2'
+#or dotted path of class with get_template(name) method
+TEMPLATE_BACKEND = 'django'
+#extra keyword arguments of jinja2 Environment
+JINJA2_ENVIRONMENT = {}
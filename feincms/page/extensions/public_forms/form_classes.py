@@ -0,0 +1,10 @@
+def form_subclass(form_class, mixins=(), **attrs):
+    '''
+        subclass of mixins and form_class with attrs and the same fields,
+        model form metaclass would collect fields from Meta again,
+        restoring fields removed from base_fields of form_class
+    '''
+    attrs.setdefault('__module__', form_class.__module__)
+    subclass = type(form_class.__name__, tuple(mixins) + (form_class,), attrs)
+    subclass.base_fields = form_class.base_fields.copy()
+    return subclass
@@ -0,0 +1,101 @@
+from hashlib import md5
+from uuid import uuid4
+
+from django.db.models.signals import post_save, post_delete
+from django.middleware.csrf import get_token
+
+from . import settings
+from .content_types import content_types
+from .loading import model_label
+
+CSRF_TOKEN_PLACEHOLDER = 'PUBLIC_FORMS_CSRF_TOKEN'
+
+
+class FragmentCache(object):
+    '''
+        cross request cache of presentation renders in
+        settings.PUBLIC_FORMS_FRAGMENT_CACHE backend,
+        used by renderers with cache_presentation = True
+
+        fragments are keyed on renderer.get_fragment_key and on versions
+        of the public form row and of its content object, version is
+        dropped on save or delete of a row, so fragments of it are never
+        looked up again; csrf token is stored as placeholder and replaced
+        with token of current request after lookup
+
+        other rows are not versioned, so renderers with formsets or with
+        model choice fields are never cached (renderer.can_cache_presentation)
+    '''
+    key_prefix = 'public_forms:fragment'
+    version_prefix = 'public_forms:fragment_version'
+
+    def get_backend(self):
+        alias = settings.PUBLIC_FORMS_FRAGMENT_CACHE
+        if not alias:
+            return None
+        from .caches import get_cache_backend
+        return get_cache_backend(alias)
+
+    def get_version_key(self, model, object_id):
+        return '%s:%s:%s'%(self.version_prefix, model_label(model), object_id)
+
+    def get_versions(self, backend, rows):
+        '''versions of (model, object id) rows, missing ones are new'''
+        keys = [self.get_version_key(*row) for row in rows]
+        versions = backend.get_many(keys)
+        missing = dict((key, uuid4().hex) for key in keys \
+                            if key not in versions)
+        if missing:
+            backend.set_many(missing, settings.PUBLIC_FORMS_FRAGMENT_CACHE_TIMEOUT)
+            versions.update(missing)
+        return tuple(versions[key] for key in keys)
+
+    def get_rows(self, renderer):
+        content = renderer.instance
+        rows = [(type(content), content.pk)]
+        if content.content_type_id and content.object_id is not None:
+            model = content_types.model_for_id(content.content_type_id)
+            if model is not None:
+                rows += (model, content.object_id),
+        return rows
+
+    def get_key(self, backend, renderer, request):
+        content = renderer.instance
+        parts = (model_label(type(content)),
+                 content.pk,
+                 content.variation,
+                 self.get_versions(backend, self.get_rows(renderer)),
+                 renderer.get_fragment_key(request))
+        return '%s:%s'%(self.key_prefix, md5(repr(parts)).hexdigest())
+
+    def render(self, renderer, request, render):
+        '''returns cached fragment or stores result of render()'''
+        backend = self.get_backend()
+        if backend is None or not renderer.can_cache_presentation():
+            return render()
+        key = self.get_key(backend, renderer, request)
+        fragment = backend.get(key)
+        if fragment is None:
+            fragment = render()
+            token = request.META.get('CSRF_COOKIE')
+            cached = fragment.replace(token, CSRF_TOKEN_PLACEHOLDER) \
+                        if token else fragment
+            backend.set(key, cached, settings.PUBLIC_FORMS_FRAGMENT_CACHE_TIMEOUT)
+            return fragment
+        if CSRF_TOKEN_PLACEHOLDER in fragment:
+            fragment = fragment.replace(CSRF_TOKEN_PLACEHOLDER,
+                                        get_token(request) or '')
+        return fragment
+
+    def row_changed(self, sender, instance, **kwargs):
+        #one delete per save, targets of other processes are unknown here
+        backend = self.get_backend()
+        if backend is not None and instance.pk is not None:
+            backend.delete(self.get_version_key(sender, instance.pk))
+
+fragment_cache = FragmentCache()
+
+post_save.connect(fragment_cache.row_changed, weak=False,
+                  dispatch_uid='public_forms_fragment_row_saved')
+post_delete.connect(fragment_cache.row_changed, weak=False,
+                    dispatch_uid='public_forms_fragment_row_deleted')
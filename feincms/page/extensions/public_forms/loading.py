@@ -0,0 +1,192 @@
+from collections import defaultdict
+from copy import copy
+
+from django.db.models.signals import post_save, post_delete
+
+from . import settings
+from .content_types import content_types
+
+
+def public_form_types(page_class):
+    from .models import PublicForm
+    return tuple(content_type for content_type \
+                    in getattr(page_class, '_feincms_content_types', ()) \
+                    if issubclass(content_type, PublicForm))
+
+
+def model_label(model):
+    '''
+        label of concrete model, proxy and deferred classes share its rows,
+        labels do not need ContentType rows
+    '''
+    model = content_types.normalize_model(model)
+    while model._meta.proxy:
+        model = model._meta.proxy_for_model
+    return '%s.%s'%(model._meta.app_label, model._meta.object_name.lower())
+
+
+class ContentObjectCache(object):
+    '''
+        cross request cache of content objects in
+        settings.PUBLIC_FORMS_CONTENT_OBJECT_CACHE backend,
+        deleted objects are cached as misses
+    '''
+    key_prefix = 'public_forms:content_object'
+    missing = 'public_forms:missing'
+
+    def get_backend(self):
+        alias = settings.PUBLIC_FORMS_CONTENT_OBJECT_CACHE
+        if not alias:
+            return None
+        from .caches import get_cache_backend
+        return get_cache_backend(alias)
+
+    def get_key(self, model, object_id):
+        return '%s:%s:%s'%(self.key_prefix, model_label(model), object_id)
+
+    def get_many(self, model, object_ids):
+        '''returns {object id: object or None} of cached objects only'''
+        backend = self.get_backend()
+        if backend is None:
+            return {}
+        model = content_types.normalize_model(model)
+        keys = dict((self.get_key(model, object_id), object_id) \
+                        for object_id in object_ids)
+        objects = {}
+        for key, value in backend.get_many(keys.keys()).items():
+            if value == self.missing:
+                objects[keys[key]] = None
+            elif type(value) is model:
+                #objects cached by other proxies of the model are misses
+                objects[keys[key]] = value
+        return objects
+
+    def set_many(self, model, objects):
+        backend = self.get_backend()
+        if backend is None:
+            return
+        backend.set_many(dict((self.get_key(model, object_id),
+                               self.missing if obj is None else obj) \
+                                    for object_id, obj in objects.items()),
+                         settings.PUBLIC_FORMS_CONTENT_OBJECT_CACHE_TIMEOUT)
+
+    def object_saved(self, sender, instance, **kwargs):
+        #one delete per save, targets of other processes are unknown here
+        backend = self.get_backend()
+        if backend is not None:
+            backend.delete(self.get_key(sender, instance.pk))
+
+    def object_deleted(self, sender, instance, **kwargs):
+        backend = self.get_backend()
+        if backend is not None:
+            backend.set(self.get_key(sender, instance.pk),
+                        self.missing,
+                        settings.PUBLIC_FORMS_CONTENT_OBJECT_CACHE_TIMEOUT)
+
+content_object_cache = ContentObjectCache()
+
+post_save.connect(content_object_cache.object_saved, weak=False,
+                  dispatch_uid='public_forms_content_object_saved')
+post_delete.connect(content_object_cache.object_deleted, weak=False,
+                    dispatch_uid='public_forms_content_object_deleted')
+
+
+def fetch_objects(model, object_ids, using=None):
+    '''returns {object id: object or None} for all ids, looking in cache first'''
+    objects = content_object_cache.get_many(model, object_ids)
+    missing = [object_id for object_id in object_ids \
+                    if object_id not in objects]
+    if missing:
+        fetched = model._default_manager.using(using).in_bulk(missing)
+        fetched = dict((object_id, fetched.get(object_id)) \
+                            for object_id in missing)
+        content_object_cache.set_many(model, fetched)
+        objects.update(fetched)
+    return objects
+
+
+class ContentObjectLoader(object):
+    '''
+        request scoped identity map of PublicForm content objects,
+        objects of all public forms of a page are fetched with one
+        IN query per content type, forms targeting the same row
+        share the fetched row, every form gets own copy of it,
+        since model forms write posted values to their instances
+
+        content classes overriding get_content_object could define
+            @classmethod
+            def prefetch_content_objects(cls, contents, loader)
+        which is called once per page with all contents of that class,
+        loader.get_many could be used there to batch own queries
+    '''
+    request_attr = '_public_forms_content_objects'
+
+    @classmethod
+    def for_request(cls, request):
+        loader = getattr(request, cls.request_attr, None)
+        if loader is None:
+            loader = cls()
+            setattr(request, cls.request_attr, loader)
+        return loader
+
+    def __init__(self):
+        self._objects = {}
+        self._loaded_pages = set()
+        self._loaded_contents = set()
+
+    def get_many(self, model, object_ids, using=None):
+        '''returns {object id: object or None}, unknown ids fetched in one query'''
+        content_type_id = content_types.id_for_model(model)
+        missing = [object_id for object_id in object_ids \
+                        if (content_type_id, object_id) not in self._objects]
+        if missing:
+            for object_id, obj in fetch_objects(model, missing, using).items():
+                self._objects[(content_type_id, object_id)] = obj
+        return dict((object_id, self._objects[(content_type_id, object_id)]) \
+                        for object_id in object_ids)
+
+    def copy_object(self, obj):
+        if obj is None:
+            return None
+        obj_copy = copy(obj)
+        obj_copy._state = copy(obj._state)
+        return obj_copy
+
+    def load(self, contents):
+        groups = defaultdict(list)
+        hooks = defaultdict(list)
+        for content in contents:
+            content_class = type(content)
+            #unsaved contents have no identity, their hooks run every time
+            key = (content_class, content.pk)
+            if content.pk is None or key not in self._loaded_contents:
+                content.pk is None or self._loaded_contents.add(key)
+                if hasattr(content_class, 'prefetch_content_objects'):
+                    hooks[content_class] += content,
+            cache_attr = content_class.content_object.cache_attr
+            if hasattr(content, cache_attr) or not content.content_type_id \
+                    or content.object_id is None:
+                continue
+            groups[(content.content_type_id, content._state.db)] += content,
+
+        for (content_type_id, using), group in groups.iteritems():
+            model = content_types.model_for_id(content_type_id)
+            if model is None:
+                continue
+            objects = self.get_many(model,
+                                    set(content.object_id for content in group),
+                                    using)
+            for content in group:
+                setattr(content, type(content).content_object.cache_attr,
+                        self.copy_object(objects[content.object_id]))
+
+        for content_class, group in hooks.iteritems():
+            content_class.prefetch_content_objects(group, self)
+
+    def load_page(self, page):
+        if page is None or id(page) in self._loaded_pages:
+            return
+        self._loaded_pages.add(id(page))
+        types = public_form_types(type(page))
+        if types:
+            self.load(page.content.all_of_type(types))
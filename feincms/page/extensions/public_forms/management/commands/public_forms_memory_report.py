@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...memory import workers_memory_report
+
+
+class Command(BaseCommand):
+    args = '<master pid>'
+    help = 'Prints shared and private memory (Kb) of prefork master '\
+           'and each of its workers.'
+
+    def handle(self, *args, **options):
+        if len(args) != 1 or not args[0].isdigit():
+            raise CommandError('Usage: %s'%self.args)
+        try:
+            report = workers_memory_report(args[0])
+        except EnvironmentError, e:
+            raise CommandError(e)
+
+        self.stdout.write('%8s %10s %10s %10s %10s\n'%('pid', 'rss', 'pss',
+                                                     'shared', 'private'))
+        for pid, usage in report:
+            self.stdout.write('%8s %10d %10d %10d %10d\n'%(pid,
+                                                         usage['Rss'],
+                                                         usage['Pss'],
+                                                         usage['shared'],
+                                                         usage['private']))
@@ -0,0 +1,36 @@
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand, CommandError
+
+from ...warmup import warm_up, describe_content
+
+
+class Command(NoArgsCommand):
+    help = 'Prebuilds renderers, forms, formsets and templates '\
+           'of every public form content on every page.'
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--fail', action='store_true', dest='fail', default=False,
+                    help='Stop on the first form which could not be warmed up.'),
+    )
+
+    def handle_noargs(self, **options):
+        verbosity = int(options.get('verbosity', 1))
+        try:
+            report = warm_up(raise_errors=options.get('fail', False))
+        except Exception, e:
+            raise CommandError('Warm up failed: %s'%e)
+
+        total = 0.0
+        failed = 0
+        for content, elapsed, error in report:
+            total += elapsed
+            if error is not None:
+                failed += 1
+                self.stderr.write(u'%s: %s\n'%(describe_content(content), error))
+            elif verbosity:
+                self.stdout.write(u'%s: %.4fs\n'%(describe_content(content),
+                                                  elapsed))
+        if verbosity:
+            self.stdout.write(u'%d public forms warmed up in %.4fs, %d failed\n'\
+                                    %(len(report), total, failed))
@@ -0,0 +1,47 @@
+from django.forms import Media
+
+from .caches import BoundedCache
+
+
+class FrozenMedia(Media):
+    '''
+        media shared between requests, could not be extended in place,
+        combine it with + which returns new Media
+    '''
+    def __init__(self, media=None, **kwargs):
+        super(FrozenMedia, self).__init__(media, **kwargs)
+        self._css = dict((medium, tuple(paths)) \
+                            for medium, paths in self._css.items())
+        self._js = tuple(self._js)
+        self._frozen = True
+
+    def _check_frozen(self):
+        if getattr(self, '_frozen', False):
+            raise TypeError('%s could not be modified, use + instead'%\
+                                                    self.__class__.__name__)
+
+    def add_js(self, data):
+        self._check_frozen()
+        super(FrozenMedia, self).add_js(data)
+
+    def add_css(self, data):
+        self._check_frozen()
+        super(FrozenMedia, self).add_css(data)
+
+
+def freeze_media(*medias):
+    '''returns deduplicated FrozenMedia combined from all passed medias'''
+    combined = Media()
+    for media in medias:
+        if media is not None:
+            combined = combined + media
+    return FrozenMedia(css=combined._css, js=combined._js)
+
+
+def form_class_media(form_class):
+    '''media of form class, no form is built for it'''
+    form = form_class.__new__(form_class)
+    form.fields = form_class.base_fields
+    return form.media
+
+media_cache = BoundedCache()
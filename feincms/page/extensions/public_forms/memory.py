@@ -0,0 +1,51 @@
+import os
+
+SMAPS_FIELDS = ('Rss', 'Pss',
+                'Shared_Clean', 'Shared_Dirty',
+                'Private_Clean', 'Private_Dirty')
+
+
+def read_smaps(pid):
+    for name in ('smaps_rollup', 'smaps'):
+        path = '/proc/%s/%s'%(pid, name)
+        if os.path.exists(path):
+            with open(path) as smaps:
+                return smaps.read()
+    raise EnvironmentError('memory maps of process %s are not available'%pid)
+
+
+def memory_usage(pid=None):
+    '''
+        returns dict of shared and private memory of process in Kb,
+        linux only (reads /proc/<pid>/smaps)
+    '''
+    usage = dict((field, 0) for field in SMAPS_FIELDS)
+    for line in read_smaps(pid or os.getpid()).splitlines():
+        field, sep, value = line.partition(':')
+        if field in usage:
+            usage[field] += int(value.split()[0])
+    usage['shared'] = usage['Shared_Clean'] + usage['Shared_Dirty']
+    usage['private'] = usage['Private_Clean'] + usage['Private_Dirty']
+    return usage
+
+
+def child_pids(pid):
+    children = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/%s/stat'%name) as stat:
+                #comm could contain spaces, ppid goes after it
+                ppid = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (EnvironmentError, IndexError, ValueError):
+            continue
+        if ppid == int(pid):
+            children += int(name),
+    return sorted(children)
+
+
+def workers_memory_report(master_pid):
+    '''returns [(pid, memory usage), ...] for master and its workers'''
+    return [(pid, memory_usage(pid)) for pid \
+                in [int(master_pid)] + child_pids(master_pid)]
@@ -1,7 +1,6 @@
-from importlib import import_module
-
-
-from django.db import models
+from django.db import models, connections, transaction, DEFAULT_DB_ALIAS
+from django.db.models.options import DEFAULT_NAMES
+from django.db.models.signals import post_syncdb
 
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
@@ -9,26 +8,43 @@ from django.forms import Media
 
 
 from . import settings
+from .registry import registry
+from .content_types import content_types
+from .media import freeze_media, media_cache
+from .loading import fetch_objects, public_form_types
 
 # Create your models here.
 
 def path_represented_object(path):
-    obj_module, obj_name = path.rsplit('.', 1)
-    if not obj_module or not obj_name:
-        raise ValueError('%s is not a valid module path'%path)
-    try:
-        return getattr(import_module(obj_module), obj_name)
-    except AttributeError:
-        raise AttributeError("'%s' object has no attribute '%s'"%(obj_module, 
-                                                                  obj_name))
+    return registry.resolve(path)
 
 
 class ContentObjectForeignKey(generic.GenericForeignKey):
+    def get_object(self, instance, owner):
+        '''GenericForeignKey.__get__ resolving content type through ContentTypeMap'''
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self.cache_attr)
+        except AttributeError:
+            rel_obj = None
+            content_type_id = getattr(instance, 
+                                      self.model._meta.get_field(self.ct_field).\
+                                                                get_attname(),
+                                      None)
+            if content_type_id:
+                model = content_types.model_for_id(content_type_id)
+                object_id = getattr(instance, self.fk_field)
+                if model is not None and object_id is not None:
+                    rel_obj = fetch_objects(model, [object_id],
+                                            instance._state.db)[object_id]
+            setattr(instance, self.cache_attr, rel_obj)
+            return rel_obj
+
     def __get__(self, instance, owner):
         if instance and hasattr(instance, 'get_content_object'):
-            return instance.get_content_object(super(ContentObjectForeignKey, 
-                                                                self).__get__)
-        return super(ContentObjectForeignKey, self).__get__(instance, owner)
+            return instance.get_content_object(self.get_object)
+        return self.get_object(instance, owner)
 
 
 class DynamicEditableFieldMixin(object):
@@ -78,18 +94,25 @@ class ContentTypeField(DynamicEditableFieldMixin,
 
 
     def modify_default(self, value):
-        return ContentType.objects.get_for_model(value).id \
+        return content_types.id_for_model(value) \
                 if value is not None else value
 
 class PublicForm(models.Model):
     @property
     def media(self):
         if not hasattr(self, '_media'):
-            self._media = getattr(self, 'content_media', Media())
             renderer_media = self.render.get_media()
-            if renderer_media:
-                self._media.add_js(renderer_media._js)
-                self._media.add_css(renderer_media._css)
+            content_media = getattr(self, 'content_media', None)
+            if content_media is None:
+                self._media = renderer_media or Media()
+            else:
+                #renderer media is cached, so is combination with it
+                key = (type(self), renderer_media)
+                self._media = media_cache.get(key)
+                if self._media is None:
+                    self._media = media_cache.set(key,
+                                        freeze_media(content_media,
+                                                     renderer_media))
         return self._media
     
     class Meta:
@@ -108,9 +131,90 @@ class PublicForm(models.Model):
     content_type = ContentTypeField(ContentType)
     content_object = ContentObjectForeignKey('content_type', 'object_id')
 
+    @classmethod
+    def targeting(cls, obj):
+        '''
+            contents of concrete public form type targeting obj,
+            filtered by (content_type, object_id) which is indexed
+            for every registered content type
+        '''
+        return cls.objects.filter(content_type=content_types.id_for_model(type(obj)),
+                                  object_id=obj.pk)
+
+
+def contents_targeting(obj, page_class=None):
+    '''returns all public form contents of page_class (Page by default) targeting obj'''
+    if page_class is None:
+        from feincms.module.page.models import Page as page_class
+    contents = []
+    for content_type in public_form_types(page_class):
+        contents += list(content_type.targeting(obj))
+    return contents
+
+
+OBJECT_INDEX = ('content_type', 'object_id')
+index_together_supported = 'index_together' in DEFAULT_NAMES
+indexed_content_types = set()
+#(db alias, table) of indexes created by create_object_indexes
+created_object_indexes = set()
+
+def add_object_index(content_type):
+    if index_together_supported:
+        index_together = list(content_type._meta.index_together)
+        if not OBJECT_INDEX in index_together:
+            content_type._meta.index_together = index_together + [OBJECT_INDEX,]
+    indexed_content_types.add(content_type)
+
+
+def object_index_columns(model):
+    return [model._meta.get_field(name).column for name in OBJECT_INDEX]
+
+
+def object_index_name(model, connection):
+    return ('%s_%s'%(model._meta.db_table,
+                     '_'.join(object_index_columns(model))))\
+                                    [:connection.ops.max_name_length()]
+
+
+def create_object_indexes(sender, created_models, db=DEFAULT_DB_ALIAS, **kwargs):
+    '''
+        creates (content_type, object_id) indexes for django without
+        index_together, post_syncdb is sent once per application with
+        the same created_models, so every index is created once
+    '''
+    connection = connections[db]
+    quote_name = connection.ops.quote_name
+    for model in created_models:
+        table = model._meta.db_table
+        if not model in indexed_content_types \
+                or (db, table) in created_object_indexes:
+            continue
+        created_object_indexes.add((db, table))
+        columns = object_index_columns(model)
+        index_name = object_index_name(model, connection)
+        connection.cursor().execute('CREATE INDEX %s ON %s (%s)'%\
+                                        (quote_name(index_name),
+                                         quote_name(table),
+                                         ', '.join(quote_name(column) \
+                                                    for column in columns)))
+        transaction.commit_unless_managed(using=db)
+
+if not index_together_supported:
+    post_syncdb.connect(create_object_indexes,
+                        dispatch_uid='public_forms_create_object_indexes')
+
 
 def register(cls, admin_cls):
     for model in settings.PUBLIC_FORMS_CONTENT_TYPES:
-        if isinstance(model, basestring):
-            model = path_represented_object(model)
-        cls.create_content_type(model)
\ No newline at end of file
+        model = registry.resolve_setting(model, 'PUBLIC_FORMS_CONTENT_TYPES')
+        content_type = cls.create_content_type(model)
+        if content_type is not None:
+            add_object_index(content_type)
+        for content_model in (model, content_type):
+            if content_model is not None:
+                registry.check_renderers(content_model,
+                                         content_model.renderer_choices)
+
+
+from . import register_page_extension
+register_page_extension()
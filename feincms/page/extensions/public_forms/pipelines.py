@@ -0,0 +1,75 @@
+from functools import wraps
+
+from feincms.page.extensions.variative_renderer.renderers import BaseRenderer
+
+
+def memoized(method_name, method):
+    '''result is kept in instance slot until reset_pipelines'''
+    slot = '_cached_%s_result'%method_name
+    def pipeline(self, *args, **kwargs):
+        try:
+            return self.__dict__[slot]
+        except KeyError:
+            result = self.__dict__[slot] = method(self, *args, **kwargs)
+            return result
+    pipeline.memoized_slot = slot
+    return pipeline
+
+
+def owned_pipeline(owner, method_name, method, pipeline, defined):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if type(self) is owner:
+            return pipeline(self, *args, **kwargs)
+        #super() call from subclass, pipeline of its class already runs
+        if defined:
+            return method(self, *args, **kwargs)
+        #owner inherits method, next class of instance mro implements it
+        return getattr(super(owner, self), method_name)(*args, **kwargs)
+    wrapper.pipeline_method = method
+    wrapper.pipeline_defined = defined
+    return wrapper
+
+
+def resolve_method(cls, method_name):
+    '''
+        first implementation of method in mro, wrappers set on classes
+        which only inherit the method are skipped, so overrides of
+        classes later in mro (mixins, diamonds) are not shadowed
+    '''
+    for klass in cls.__mro__:
+        method = klass.__dict__.get(method_name)
+        if method is None:
+            continue
+        if not hasattr(method, 'pipeline_method'):
+            return getattr(method, '__func__', method)
+        if method.pipeline_defined:
+            return method.pipeline_method
+    return None
+
+
+class PipelineRendererMetaclass(type(BaseRenderer)):
+    '''
+        composes methods listed in pipelines once per class:
+
+            pipelines = (('get_form', (stage, ...)),)
+
+        stage(method_name, method) returns function(self, *args, **kwargs)
+        wrapping method, first stage is the innermost one
+    '''
+    def __init__(cls, name, bases, attrs):
+        super(PipelineRendererMetaclass, cls).__init__(name, bases, attrs)
+        memoized_slots = []
+        for method_name, stages in getattr(cls, 'pipelines', ()):
+            method = resolve_method(cls, method_name)
+            if method is None:
+                continue
+            pipeline = method
+            for stage in stages:
+                pipeline = stage(method_name, pipeline)
+                if hasattr(pipeline, 'memoized_slot'):
+                    memoized_slots += pipeline.memoized_slot,
+            setattr(cls, method_name, owned_pipeline(cls, method_name, method,
+                                                     pipeline,
+                                                     method_name in attrs))
+        cls.memoized_slots = tuple(memoized_slots)
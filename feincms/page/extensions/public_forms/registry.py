@@ -0,0 +1,52 @@
+from importlib import import_module
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+def import_object(path):
+    obj_module, obj_name = path.rsplit('.', 1)
+    if not obj_module or not obj_name:
+        raise ValueError('%s is not a valid module path'%path)
+    try:
+        return getattr(import_module(obj_module), obj_name)
+    except AttributeError:
+        raise AttributeError("'%s' object has no attribute '%s'"%(obj_module,
+                                                                  obj_name))
+
+
+class Registry(object):
+    '''
+        resolves dotted paths once, renderer_choices of content types
+        are resolved at registration, so bad paths fail at boot
+    '''
+    def __init__(self):
+        self._objects = {}
+
+    def resolve(self, path):
+        try:
+            return self._objects[path]
+        except KeyError:
+            obj = self._objects[path] = import_object(path)
+            return obj
+
+    def resolve_setting(self, path, setting_name):
+        '''resolves path at boot, reporting bad ones as configuration errors'''
+        if not isinstance(path, basestring):
+            return path
+        try:
+            return self.resolve(path)
+        except (ImportError, AttributeError, ValueError), e:
+            raise ImproperlyConfigured('%s contains invalid path `%s`: %s'%\
+                                                    (setting_name, path, e))
+
+    def check_renderers(self, content_type, renderer_choices):
+        '''resolves renderer_choices at boot, so bad paths fail early'''
+        for choice in renderer_choices:
+            renderer = self.resolve_setting(choice, '%s.renderer_choices'%\
+                                                        content_type.__name__)
+            if not isinstance(renderer, type):
+                raise ImproperlyConfigured('%s.renderer_choices contains `%r`,'
+                                           ' which is not a class'%\
+                                                (content_type.__name__, choice))
+
+registry = Registry()
@@ -0,0 +1,142 @@
+from django.forms.forms import BoundField
+from django.utils.encoding import force_unicode
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from . import settings
+from .caches import BoundedCache
+from .form_classes import form_subclass
+
+NORMAL_ROW = u'<tr%s><th>%s</th><td>'
+ERROR_ROW = u'<tr><td colspan="2">%s</td></tr>'
+ROW_ENDER = u'</td></tr>'
+HELP_TEXT_HTML = u'<br /><span class="helptext">%s</span>'
+
+
+def field_signature(field):
+    '''attributes of field which plan caches'''
+    return (field.label, field.help_text, field.widget.is_hidden,
+            field.widget.attrs.get('id'))
+
+
+def same_signature(first, second):
+    #lazy translations are compared by identity
+    return all(a is b or a == b for a, b in zip(first, second))
+
+
+class FormRenderPlan(object):
+    '''
+        as_table output of a form split into static segments
+        (labels, help texts, row markup), computed once,
+        and value slots (errors, widgets), filled on each render;
+        forms changing labels or widgets of their fields per instance
+        do not match the plan and are rendered by django
+    '''
+    def __init__(self, form):
+        self.rows = []
+        self.signatures = dict((name, field_signature(field)) \
+                                    for name, field in form.fields.items())
+        #css classes depend on errors and values
+        self.dynamic_css_classes = bool(getattr(form, 'error_css_class', None)
+                                    or getattr(form, 'required_css_class', None))
+        for name, field in form.fields.items():
+            bf = BoundField(form, field, name)
+            if bf.is_hidden:
+                self.rows += (name, True, None, None),
+                continue
+            if bf.label:
+                label = conditional_escape(force_unicode(bf.label))
+                if form.label_suffix:
+                    if label[-1] not in ':?.!':
+                        label += form.label_suffix
+                label = bf.label_tag(label) or ''
+            else:
+                label = ''
+            if field.help_text:
+                help_text = HELP_TEXT_HTML%force_unicode(field.help_text)
+            else:
+                help_text = u''
+            self.rows += (name, False, force_unicode(label),
+                          help_text + ROW_ENDER),
+
+    def matches(self, form):
+        fields = form.fields
+        return all(same_signature(signature, field_signature(fields[name])) \
+                        for name, signature in self.signatures.iteritems())
+
+    def render(self, form):
+        top_errors = form.non_field_errors()
+        output, hidden_fields = [], []
+        html_class_attr = ''
+
+        for name, is_hidden, label, tail in self.rows:
+            html_class_attr = ''
+            bf = BoundField(form, form.fields[name], name)
+            bf_errors = form.error_class([conditional_escape(error) \
+                                            for error in bf.errors])
+            if is_hidden:
+                if bf_errors:
+                    top_errors.extend([u'(Hidden field %s) %s'%\
+                                            (name, force_unicode(e)) \
+                                                for e in bf_errors])
+                hidden_fields.append(unicode(bf))
+                continue
+
+            if self.dynamic_css_classes:
+                css_classes = bf.css_classes()
+                if css_classes:
+                    html_class_attr = ' class="%s"'%css_classes
+            output.append(u''.join((NORMAL_ROW%(html_class_attr, label),
+                                    force_unicode(bf_errors),
+                                    unicode(bf),
+                                    tail)))
+
+        if top_errors:
+            output.insert(0, ERROR_ROW%force_unicode(top_errors))
+
+        if hidden_fields:
+            str_hidden = u''.join(hidden_fields)
+            if output:
+                last_row = output[-1]
+                if not last_row.endswith(ROW_ENDER):
+                    last_row = NORMAL_ROW%(html_class_attr, '') + ROW_ENDER
+                    output.append(last_row)
+                output[-1] = last_row[:-len(ROW_ENDER)] + str_hidden + ROW_ENDER
+            else:
+                output.append(str_hidden)
+        return mark_safe(u'\n'.join(output))
+
+render_plans = BoundedCache(settings.PUBLIC_FORMS_FORM_CLASS_CACHE_SIZE)
+
+
+def get_render_plan(form):
+    #labels are translated, fields could be added to form instances
+    key = (type(form), form.prefix, tuple(form.fields), form.auto_id,
+           form.label_suffix, get_language())
+    plan = render_plans.get(key)
+    if plan is None:
+        plan = render_plans.set(key, FormRenderPlan(form))
+    return plan
+
+
+class RenderPlanFormMixin(object):
+    '''renders as_table (and so {{ form }}) through cached render plan'''
+    def as_table(self):
+        plan = get_render_plan(self)
+        if not plan.matches(self):
+            return super(RenderPlanFormMixin, self).as_table()
+        return plan.render(self)
+
+render_plan_form_classes = BoundedCache(
+                                settings.PUBLIC_FORMS_FORM_CLASS_CACHE_SIZE)
+
+
+def render_plan_form_class(form_class):
+    if issubclass(form_class, RenderPlanFormMixin):
+        return form_class
+    plan_form_class = render_plan_form_classes.get(form_class)
+    if plan_form_class is None:
+        plan_form_class = render_plan_form_classes.set(form_class,
+                            form_subclass(form_class, (RenderPlanFormMixin,)))
+    return plan_form_class
@@ -1,4 +1,4 @@
-from functools import wraps
+from functools import partial
 from django.views.generic.edit import (CreateView,
                                        UpdateView,
                                        DeleteView,
@@ -8,43 +8,73 @@ from django.views.generic.edit import (CreateView,
 from collections import OrderedDict
 from copy import copy
 
-from django.forms import Form, ModelForm, Media
+from django.forms import Form, ModelForm, ModelChoiceField
 from django.views.generic.detail import SingleObjectTemplateResponseMixin
 from django.template.response import TemplateResponse
-from django.utils.translation import get_language_from_request
+from django.utils.translation import get_language
 from django.utils.safestring import mark_safe
 from django.utils import simplejson as json
 from django.utils.translation import ugettext as _
-from django.forms.models import inlineformset_factory
 from django.db.models import ForeignKey
 
-from captcha.fields import ReCaptchaFieldAjax
-from captcha.client import RECAPTCHA_SUPPORTED_LANUAGES
-
 from feincms.page.extensions.variative_renderer.renderers import (BaseRenderer,
                                                 TemplateResponseRendererMixin)
 
 
 from . import settings
-
-#TODO: get_form caching
+from .registry import registry
+from .content_types import content_types
+from .loading import ContentObjectLoader
+from .routing import RequestRouter
+from .request_state import RequestState
+from .rendering import template_cache
+from .fragments import fragment_cache
+from .render_plans import render_plan_form_class
+from .form_classes import form_subclass
+from .media import freeze_media, media_cache, form_class_media
+from .caches import BoundedCache, freeze
+from .pipelines import PipelineRendererMetaclass, memoized
 
 
 CAPTCHA_PASSED_SESSION_KEY = getattr(settings,
                                     'PUBLIC_FORMS_CAPTCHA_PASSED_SESSION_KEY',
                                     'captcha_passed')
 
+form_class_cache = BoundedCache(settings.PUBLIC_FORMS_FORM_CLASS_CACHE_SIZE)
+formset_cache = BoundedCache(settings.PUBLIC_FORMS_FORM_CLASS_CACHE_SIZE)
+
 
 class PublicFormMediaMixin(object):
+    def get_media_key(self, renderer):
+        #type(self) since presentation class is shared between renderers
+        return (type(self),
+                getattr(renderer, 'form_class', None),
+                renderer.model,
+                bool(renderer.is_captcha_required(renderer.request)))
+
     def get_media(self):
-        if hasattr(self, '_presentation'):
-            self = self._presentation
-        form_media = self.get_form(self.get_form_class()).media
-        media = getattr(self, 'media', Media())
-        media.add_css(form_media._css)
-        media.add_js(form_media._js)
+        renderer = getattr(self, '_presentation', self)
+        key = self.get_media_key(renderer)
+        media = media_cache.get(key)
+        if media is None:
+            media = media_cache.set(key, freeze_media(getattr(renderer,
+                                                              'media',
+                                                              None),
+                                        *renderer.iter_form_classes_media()))
         return media
 
+    def iter_form_classes_media(self):
+        #media of classes, no form is built for it
+        form_class = self.get_form_class()
+        yield form_class_media(form_class)
+        if getattr(form_class, 'captcha_required', False):
+            #captcha widget is created by field, result is cached anyway
+            yield self.get_captcha_field_class()\
+                    (**self.get_captcha_field_kwargs(self.request,
+                                                     form_class)).widget.media
+        for args, formset_class in self.iter_formset_classes():
+            yield form_class_media(formset_class.form)
+
 
 class PublicFormAjaxMixin(object):
     def ajax_on_prepare(self, request, **kwargs):
@@ -54,8 +84,27 @@ class PublicFormAjaxMixin(object):
         return self.render(request, **kwargs)
 
 
+required_fields_cache = BoundedCache(settings.PUBLIC_FORMS_FORM_CLASS_CACHE_SIZE)
+
+def get_required_fields_json(formclass):
+    '''json list of required field names, built once per form class'''
+    required_fields = required_fields_cache.get(formclass)
+    if required_fields is None:
+        #ordered set of names
+        names = OrderedDict()
+        for fields_dict in (getattr(formclass, 'declared_fields', {}),
+                            getattr(formclass, 'base_fields', {})):
+            for name, field in fields_dict.items():
+                if field.required:
+                    names.setdefault(name)
+        required_fields = required_fields_cache.set(formclass,
+                                    mark_safe(json.dumps(names.keys())))
+    return required_fields
+
+
 class PublicFormCaptchaMixin(object):
-    captcha_field_class = ReCaptchaFieldAjax
+    #resolved on first use, so captcha is imported only for forms requiring it
+    captcha_field_class = 'captcha.fields.ReCaptchaFieldAjax'
     
     @property
     def form_contains_errors(self):
@@ -64,7 +113,7 @@ class PublicFormCaptchaMixin(object):
         self._form_contains_errors            
     
     def is_captcha_required(self, request):
-        if request.user.is_authenticated():
+        if RequestState.for_request(request).is_authenticated:
             return False
 
         if self.instance.enable_captcha_always:
@@ -72,40 +121,42 @@ class PublicFormCaptchaMixin(object):
         if self.instance.enable_captcha_once:
             return not request.session.get(CAPTCHA_PASSED_SESSION_KEY, False)
 
+    def get_captcha_language(self, request):
+        from captcha.client import RECAPTCHA_SUPPORTED_LANUAGES
+        preferred_lang = RequestState.for_request(request).language
+        return preferred_lang if\
+                    preferred_lang in RECAPTCHA_SUPPORTED_LANUAGES else\
+                    settings.LANGUAGE_CODE[:2]
+
     def get_captcha_field_kwargs(self, request, formclass):
         kwargs = {'context':{}}
         kwargs['request'] = self.request
-        preferred_lang = get_language_from_request(self.request)
         kwargs['attrs'] = {}
-        kwargs['attrs']['lang'] = preferred_lang if\
-                                        preferred_lang in RECAPTCHA_SUPPORTED_LANUAGES else\
-                                        settings.LANGUAGE_CODE[:2]
+        kwargs['attrs']['lang'] = self.get_captcha_language(self.request)
         if hasattr(self, 'instance'):
             kwargs['context']['container_id'] = self.get_content_prefix()
         
-        
-        kwargs['context']['required_fields'] = []
-        for fields_dict in (getattr(formclass, 'declared_fields', {}),
-                            getattr(formclass, 'base_fields', {})):
-            for name, field in fields_dict.items():
-                if field.required and not name in kwargs['context']['required_fields']:
-                    kwargs['context']['required_fields'] += name,
-
-
-        kwargs['context']['required_fields'] = mark_safe(json.dumps(kwargs['context']['required_fields']))
+        kwargs['context']['required_fields'] = get_required_fields_json(formclass)
         
         kwargs['context']['form_errors'] = lambda:self.form_contains_errors
         return kwargs
 
     def get_captcha_field_class(self):
+        if isinstance(self.captcha_field_class, basestring):
+            return registry.resolve(self.captcha_field_class)
         return self.captcha_field_class
 
     def append_captcha(self, formclass):
-        captcha_field = self.get_captcha_field_class()\
-                (**self.get_captcha_field_kwargs(self.request, formclass))
-        formclass.base_fields[settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME] = \
-                                                                captcha_field
-        return formclass
+        #shared class only marks captcha as required, field is bound
+        #to request, so it is added to form instances by add_captcha_field
+        return form_subclass(formclass, captcha_required=True)
+
+    def add_captcha_field(self, form):
+        if getattr(form, 'captcha_required', False):
+            form.fields[settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME] = \
+                self.get_captcha_field_class()\
+                    (**self.get_captcha_field_kwargs(self.request, type(form)))
+        return form
 
 class PublicFormRelatedInlineFormsetMixin(object):
     default_inlineformset_factory_kwargs = getattr(settings,
@@ -113,71 +164,28 @@ class PublicFormRelatedInlineFormsetMixin(object):
                                 {'extra':2})
     @property
     def formset_factory(self):
+        from django.forms.models import inlineformset_factory
         return inlineformset_factory
     
-    def append_formset_validation(self, get_form):
-        #appends additional validation for form.is_valid
-        renderer = self
-        @wraps(get_form)
-        def wrapped(*args, **kwargs):
-            form = get_form(*args, **kwargs)
-            form.is_valid = renderer.append_is_formset_valid(form.is_valid)
-            
-            return form
-        
-        return wrapped
-
-    def append_is_formset_valid(self, is_valid):
-        #actual additional validation for form.is_valid
-        renderer = self
-        @wraps(is_valid)
-        def wrapped(*args, **kwargs):
-            form_is_valid = is_valid(*args, **kwargs)
-            self.object = self.get_form().instance
-            def now_get_object_must_return_instance_in_any_case(self):
-                return self.object
-            renderer.get_object = now_get_object_must_return_instance_in_any_case.\
-                                  __get__(renderer, renderer.__class__)
+    def is_formset_valid(self, is_valid, *args, **kwargs):
+        #form.is_valid extended with formsets validation
+        form_is_valid = is_valid(*args, **kwargs)
+        self.object = self.get_form().instance
+        self.form_instance_bound = True
 
-            for formset in renderer.get_formsets().values():
-                form_is_valid = form_is_valid and formset.is_valid()
+        for formset in self.get_formsets().values():
+            form_is_valid = form_is_valid and formset.is_valid()
 
+        return form_is_valid
 
-            return form_is_valid
-        
-        return wrapped
-    
     def formset_valid_post_save(self):
         if not self.get_success_url():
             #recreate formset since old one contains posted 
             #data (together with delete checkboxes and so forth)
             #we need actial instance data instead
-            orig_get_formset_kwargs = self.get_formset_kwargs
-            def get_formset_kwargs(self, **extra):
-                kwargs = orig_get_formset_kwargs(**extra)
-                'data' in kwargs and kwargs.pop('data')
-                'files' in kwargs and kwargs.pop('files')
-                return kwargs
-
-            self.get_formset_kwargs = get_formset_kwargs.__get__(self,
-                                                        self.__class__)
-
+            self.formsets_unbound = True
             self._cached_get_formsets_result = OrderedDict(self.iter_formsets())
 
-    def append_formset_valid(self, form_valid):
-        #action for self.form_valid extended with formsets.save()
-        renderer = self
-        @wraps(form_valid)
-        def wrapped(*args, **kwargs):
-            ret = form_valid(*args, **kwargs)
-            for formset in renderer.get_formsets().values():
-                formset.save()
-            self.formset_valid_post_save()
-            return ret
-            
-        
-        return wrapped
-
     def iter_formsets_classes_args(self, get_formset_class_args):
         for args in get_formset_class_args:
             yield [self.get_form_class(), self.model]+list(args)
@@ -194,7 +202,7 @@ class PublicFormRelatedInlineFormsetMixin(object):
                         return u'%s'%field.related.parent_model._meta.\
                                                 verbose_name_plural
 
-    def iter_formsets(self):
+    def iter_formset_classes(self):
         for inline, kwargs in getattr(self, 'inlines', ()):
             kw = copy(self.default_inlineformset_factory_kwargs)
             kw.update(kwargs)
@@ -203,16 +211,59 @@ class PublicFormRelatedInlineFormsetMixin(object):
         for args in self.iter_formsets_classes_args(getattr(self,
                                                     'get_formset_class_args',
                                                     ())):
+            yield args, self.get_cached_formset_class(*args)
+
+    def iter_formsets(self):
+        for args, formset_class in self.iter_formset_classes():
             #get_formset_class must be called before get_formset_title,
             #but returned value must be reversed for dict() casting
-            formset = self.get_formset_class(*args)(**self.get_formset_kwargs())
-            title = self.get_formset_title(args[2])
+            formset = formset_class(**self.get_formset_kwargs())
+            title = self.get_cached_formset_title(args[2])
             
             yield title, formset
         
     def get_formsets(self):
         return OrderedDict(self.iter_formsets())
 
+    def get_cached_formset_class(self, form_class, parent, through,
+                                 factory_kwargs):
+        try:
+            key = ('class', type(self), form_class, parent, through,
+                   freeze(factory_kwargs),
+                   bool(self.uses_render_plans(self.request)))
+            formset_class = formset_cache.get(key)
+        except TypeError:
+            #unhashable factory kwargs
+            return self.plan_formset_class(self.get_formset_class(form_class,
+                                                                  parent,
+                                                                  through,
+                                                                  factory_kwargs))
+        if formset_class is None:
+            formset_class = formset_cache.set(key,
+                                    self.plan_formset_class(
+                                        self.get_formset_class(form_class,
+                                                               parent,
+                                                               through,
+                                                               factory_kwargs)))
+        return formset_class
+
+    def plan_formset_class(self, formset_class):
+        #forms of formsets are rendered by plans as main form is
+        if self.uses_render_plans(self.request):
+            #get_formset_class could return shared class
+            return type(formset_class.__name__, (formset_class,),
+                        {'__module__':formset_class.__module__,
+                         'form':render_plan_form_class(formset_class.form)})
+        return formset_class
+
+    def get_cached_formset_title(self, through):
+        #titles are translated
+        key = ('title', type(self), self.model, through, get_language())
+        title = formset_cache.get(key)
+        if title is None:
+            title = formset_cache.set(key, self.get_formset_title(through))
+        return title
+
     def add_inline(self, through, **inlineformset_factory_kwargs):
         if not hasattr(self, 'get_formset_class_args'):
             self.get_formset_class_args = []
@@ -235,14 +286,52 @@ class PublicFormRelatedInlineFormsetMixin(object):
         kwargs = {'instance':self.get_object(),
                   'prefix':self.get_content_prefix(),}
         
-        self.request.POST and kwargs.update({'data':self.request.POST})
-        self.request.FILES and kwargs.update({'files':self.request.FILES})
+        if not self.formsets_unbound:
+            self.request.POST and kwargs.update({'data':self.request.POST})
+            self.request.FILES and kwargs.update({'files':self.request.FILES})
         kwargs.update(extra)
         return kwargs
 
     def get_formset(self, formset_class, **kwargs):
         return formset_class(**self.get_formset_kwargs(**kwargs))
 
+def modified_form_class(method_name, get_form_class):
+    def pipeline(self, *args, **kwargs):
+        form_class = get_form_class(self, *args, **kwargs)
+        for condition_name, modifier_name in self.form_class_modifiers:
+            if getattr(self, condition_name)(self.request):
+                form_class = getattr(self, modifier_name)(form_class)
+        return form_class
+    return pipeline
+
+def shared_form_class(method_name, get_form_class):
+    #form class is shared between requests, so only instances are built
+    def pipeline(self, *args, **kwargs):
+        key = self.get_form_class_key(
+                            bool(self.is_captcha_required(self.request)))
+        form_class = form_class_cache.get(key)
+        if form_class is None:
+            form_class = form_class_cache.set(key,
+                                    get_form_class(self, *args, **kwargs))
+        return form_class
+    return pipeline
+
+def formset_validated(method_name, get_form):
+    def pipeline(self, *args, **kwargs):
+        form = get_form(self, *args, **kwargs)
+        form.is_valid = partial(self.is_formset_valid, form.is_valid)
+        return form
+    return pipeline
+
+def formsets_saved(method_name, form_valid):
+    def pipeline(self, *args, **kwargs):
+        response = form_valid(self, *args, **kwargs)
+        for formset in self.get_formsets().values():
+            formset.save()
+        self.formset_valid_post_save()
+        return response
+    return pipeline
+
 class BasePublicForm(BaseRenderer,
                      TemplateResponseRendererMixin,
                      TemplateResponseMixin,
@@ -251,11 +340,27 @@ class BasePublicForm(BaseRenderer,
                      PublicFormMediaMixin,
                      PublicFormRelatedInlineFormsetMixin):
 
+    __metaclass__ = PipelineRendererMetaclass
+
     base_to_default = False
-    form_class_modifiers = (('is_captcha_required', 'append_captcha'),)
+    form_class_modifiers = (('is_captcha_required', 'append_captcha'),
+                            ('uses_render_plans', 'append_render_plan'))
+    #forms are rendered through cached render plans, see render_plans
+    use_render_plans = False
+    #presentation output is kept in fragment cache, see get_fragment_key
+    cache_presentation = False
+    pipelines = (('get_form_class', (modified_form_class,
+                                     shared_form_class,
+                                     memoized)),
+                 ('get_form', (formset_validated, memoized)),
+                 ('form_valid', (formsets_saved,)),
+                 ('get_formsets', (memoized,)))
+    #request state, reset by on_prepare
+    form_instance_bound = False
+    formsets_unbound = False
     
     def is_request_owner(self, request):
-        return self.get_submit_name() in request.REQUEST
+        return RequestRouter.for_request(request).owns(self.get_submit_name())
 
     def get_submit_name(self):
         if not hasattr(self, '_submit_name'):
@@ -275,7 +380,22 @@ class BasePublicForm(BaseRenderer,
     def get_form(self, form_class):
         form = super(BasePublicForm, self).get_form(form_class)
         form.submit_name = self.get_submit_name()
-        return form
+        return self.add_captcha_field(form)
+
+    def uses_render_plans(self, request):
+        return self.use_render_plans
+
+    def append_render_plan(self, formclass):
+        return render_plan_form_class(formclass)
+
+    def render_to_response(self, context, **response_kwargs):
+        response = super(BasePublicForm, self).render_to_response(context,
+                                                            **response_kwargs)
+        #compiled template, response does not resolve names on each render
+        names = getattr(response, 'template_name', None)
+        if isinstance(names, (basestring, list, tuple)):
+            response.template_name = template_cache.select_template(names)
+        return response
 
     def get_context_data(self, **kwargs):
         context = super(BasePublicForm, self).get_context_data(**kwargs)
@@ -289,50 +409,90 @@ class BasePublicForm(BaseRenderer,
             self.page = request._feincms_page
             self.page.contains_forms = True
 
+    def load_content_object(self, request):
+        loader = ContentObjectLoader.for_request(request)
+        loader.load_page(getattr(request, '_feincms_page', None))
+        loader.load([self.instance])
+        return self.instance.content_object
+
+    def reset_pipelines(self):
+        for name in self.memoized_slots + ('form_instance_bound',
+                                           'formsets_unbound'):
+            self.__dict__.pop(name, None)
+
+    def prepare_object(self):
+        self.object = self.load_content_object(self.request)
+
+    def prepare_model(self):
+        self.model = content_types.model_for_id(self.instance.content_type_id)
+
     def on_prepare(self, request, **kwargs):
-        self.object = self.instance.content_object
-        self.model = self.instance.content_type.model_class()
+        self.reset_pipelines()
+        self.request = request
+        self.prepare_object()
+        self.prepare_model()
         self.prepare_page(request)
-        self.get_form_class = self.append_modifiers(self.get_form_class,
-                                    self.form_class_modifiers)
-        
-        self.get_form = self.append_formset_validation(self.get_form)
-        self.form_valid = self.append_formset_valid(self.form_valid)
-        
-        self.get_form_class = self.cached_method(self.get_form_class)
-        self.get_form = self.cached_method(self.get_form)
-        self.get_formsets = self.cached_method(self.get_formsets)
-
-    def append_modifiers(self, wrapped, modifiers):
-        @wraps(wrapped)
-        def wrapper(self, *args, **kwargs):
-            result = wrapped(*args, **kwargs)
-            for condition_name, modifier_name in modifiers:
-                condition = getattr(self, condition_name)
-                modifier = getattr(self, modifier_name)
-                if condition(self.request):
-                    result = modifier(result)
-            return result
-        return wrapper.__get__(self, self.__class__)
-
-    def cached_method(self, wrapped):
-        instance = self
-        cache_name = '_cached_%s_result'%wrapped.func_name
-        @wraps(wrapped)
-        def wrapper(self, *args, **kwargs):
-            if not hasattr(instance, cache_name):
-                setattr(instance, cache_name, wrapped(*args, **kwargs))
-            return getattr(instance, cache_name)
-        return wrapper.__get__(self, self.__class__)
-
-    def copy_members(self, member_names, source):
-        for name in member_names:
-            if hasattr(source, name):
-                setattr(self, name, getattr(source, name))
+
+    def get_form_class_key(self, captcha_required):
+        #conditions of form_class_modifiers must not depend on anything else,
+        #otherwise extend the key
+        return (type(self),
+                self.model,
+                getattr(self, 'form_class', None),
+                captcha_required,
+                bool(self.uses_render_plans(self.request)),
+                get_language())
+
+    def can_cache_presentation(self):
+        #rows of formsets and choices are not versioned in fragment cache
+        if getattr(self, 'inlines', None) \
+                or getattr(self, 'get_formset_class_args', None):
+            return False
+        return not any(isinstance(field, ModelChoiceField) \
+                        for field in self.get_form_class().base_fields.values())
+
+    def get_fragment_key(self, request):
+        #presentation output must not depend on anything else besides
+        #content, its object and csrf token, otherwise extend the key
+        return (type(self).__module__,
+                type(self).__name__,
+                get_language(),
+                RequestState.for_request(request).is_authenticated,
+                bool(self.is_captcha_required(request)))
+
+class PreparedAttribute(object):
+    '''presentation attribute which is set by deferred preparation'''
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            return instance.__dict__[self.name]
+        except KeyError:
+            getattr(instance, 'prepare_%s'%self.name)()
+            return instance.__dict__[self.name]
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
 
 class BasePresentationPublicForm(BasePublicForm,
                                  SingleObjectTemplateResponseMixin,
                                  ModelFormMixin):
+    #forms of regions which are never rendered are never prepared,
+    #model is prepared apart from object, media needs only the former
+    object = PreparedAttribute('object')
+    model = PreparedAttribute('model')
+
+    def on_prepare(self, request, **kwargs):
+        self.reset_pipelines()
+        self.request = request
+        self.__dict__.pop('object', None)
+        self.__dict__.pop('model', None)
+        #page.contains_forms is used by page templates
+        self.prepare_page(request)
 
     def render(self, request, *args, **kwargs):
         form = self.get_form(self.get_form_class())
@@ -379,7 +539,14 @@ class BaseModificationPublicForm(BasePublicForm,
         return self.render_to_response(self.get_context_data(form=form))
 
 
+def init_function(cls):
+    init = cls.__init__
+    return getattr(init, '__func__', init)
+
+
 class PublicFormRequestDispatcher(object):
+    #presentation classes without own __init__ are built from dispatcher
+    #state, __init__ of others runs with arguments of dispatcher
     presentation_class = BasePresentationPublicForm
     copy_members_to_presentation = ('instance',
                                     'owner',
@@ -389,30 +556,63 @@ class PublicFormRequestDispatcher(object):
                                     'inlines',
                                     'get_formset_class_args')
 
+    #dispatcher state which belongs to request processing
+    presentation_excluded_state = ('_presentation',
+                                   '_routed_request',
+                                   '_owns_request',
+                                   'form_instance_bound',
+                                   'formsets_unbound',
+                                   'object',
+                                   'model')
+
+    @classmethod
+    def get_presentation_members(cls):
+        #class members are resolved once per dispatcher class
+        members = cls.__dict__.get('_presentation_members')
+        if members is None:
+            members = dict((name, getattr(cls, name)) \
+                                for name in cls.copy_members_to_presentation \
+                                    if hasattr(cls, name))
+            cls._presentation_members = members
+        return members
+
     @property
     def presentation(self):
-        if not hasattr(self, '_presentation'):
-            presentation = self.presentation_class(*self._init_args,
-                                                   **self._init_kwargs)
-            
-            presentation.copy_members(self.copy_members_to_presentation,
-                                      self)
-            
-            presentation.get_form_class = presentation.\
-                                append_modifiers(presentation.get_form_class,
-                                        presentation.form_class_modifiers)
-            for method in (presentation.get_form_class,
-                           presentation.get_form,
-                           presentation.get_formsets):
-                method = presentation.cached_method(method) 
-            
-            presentation.request = self.request
-            self._presentation = presentation
-        return self._presentation
+        try:
+            return self.__dict__['_presentation']
+        except KeyError:
+            pass
+        presentation_class = self.presentation_class
+        if init_function(presentation_class) is \
+                init_function(BasePresentationPublicForm):
+            #presentation is initialized with the same arguments, so it
+            #reuses dispatcher state instead of running __init__ again
+            presentation = presentation_class.__new__(presentation_class)
+            init_state = ()
+        else:
+            presentation = presentation_class(*self._init_args,
+                                              **self._init_kwargs)
+            init_state = set(presentation.__dict__)
+        state = presentation.__dict__
+        state.update(self.get_presentation_members())
+        excluded = self.presentation_excluded_state
+        for name, value in self.__dict__.iteritems():
+            if not name in excluded and not name in init_state \
+                    and not name.startswith('_cached_'):
+                state[name] = value
+        self._presentation = presentation
+        return presentation
+
+    def owns_request(self, request):
+        #routed once per request, dispatch_method runs several times
+        if self.__dict__.get('_routed_request') is not request:
+            self._routed_request = request
+            self._owns_request = self.is_request_owner(request)
+        return self._owns_request
 
     def dispatch_method(self, method_name, request):
             self.request = request
-            if self.is_request_owner(request):
+            if self.owns_request(request):
                 if request.is_ajax():
                     return getattr(self, 'ajax_%s'%method_name)
                 else:
@@ -422,8 +622,12 @@ class PublicFormRequestDispatcher(object):
         
 
     def __call__(self, request, *args, **kwargs):
-        return unicode(self.dispatch_method('render',
-                                        request)(request, *args, **kwargs))
+        render = self.dispatch_method('render', request)
+        if not self.cache_presentation or self.owns_request(request):
+            return unicode(render(request, *args, **kwargs))
+        return fragment_cache.render(self.presentation, request,
+                                     lambda:unicode(render(request,
+                                                           *args, **kwargs)))
 
     def process(self, request, **kwargs):
         return self.dispatch_method('on_prepare', request)(request, **kwargs)
@@ -435,7 +639,9 @@ class PublicFormRequestDispatcher(object):
 class BaseCreatePublicForm(BaseModificationPublicForm, CreateView):
     template_name_suffix = '_create'
     def get_object(self):
-        pass
+        #validated form has instance to be created
+        if self.form_instance_bound:
+            return self.object
     
     def form_valid(self, form):
         ret = super(BaseCreatePublicForm, self).form_valid(form)
@@ -444,52 +650,51 @@ class BaseCreatePublicForm(BaseModificationPublicForm, CreateView):
         form.files = {}
         return ret
 
-    def formset_valid_post_save(self):
-        if not self.get_success_url():
-            #recreate formset since old one contains posted 
-            #data (together with 'delete' checkboxes and so forth)
-            #we need actial instance data instead
-            orig_get_formset_kwargs = self.get_formset_kwargs
-            def get_formset_kwargs(self, **extra):
-                kwargs = orig_get_formset_kwargs(**extra)
-                'data' in kwargs and kwargs.pop('data')
-                'files' in kwargs and kwargs.pop('files')
-                'instance' in kwargs and kwargs.pop('instance')
-                return kwargs
-
-            self.get_formset_kwargs = get_formset_kwargs.__get__(self,
-                                                        self.__class__)
-
-            self._cached_get_formsets_result = \
-                                    OrderedDict(self.iter_formsets())
+    def get_formset_kwargs(self, **extra):
+        kwargs = super(BaseCreatePublicForm, self).get_formset_kwargs(**extra)
+        #formsets recreated after save are blank ones
+        self.formsets_unbound and kwargs.pop('instance', None)
+        return kwargs
 
 class BaseUpdatePublicForm(BaseModificationPublicForm, UpdateView):
     '''Update'''
     template_name_suffix = '_update'
 
 
+delete_form_classes = BoundedCache(settings.PUBLIC_FORMS_FORM_CLASS_CACHE_SIZE)
+
+def build_delete_form_class(model, parent_form_class):
+    delete_model = model
+    class DummyDeleteForm(parent_form_class):
+        class Meta:
+            model = delete_model
+        def __unicode__(self):
+            return u''
+
+    DummyDeleteForm.base_fields.clear()
+    return DummyDeleteForm
+
+def get_delete_form_class(model, parent_form_class=None):
+    '''fieldless form class, built once per (model, parent form class)'''
+    key = (model, parent_form_class or Form)
+    form_class = delete_form_classes.get(key)
+    if form_class is None:
+        form_class = delete_form_classes.set(key,
+                                             build_delete_form_class(*key))
+    return form_class
+
 class BaseDeletePublicForm(BaseModificationPublicForm, DeleteView):
     '''Delete'''
     template_name_suffix = '_delete'
     def get_form_class(self, *args, **kwargs):
-        dummy_parent_form = getattr(self, 'form_class', Form)
-        class DummyDeleteForm(dummy_parent_form and dummy_parent_form or Form):
-            class Meta:
-                model = self.model
-            def __unicode__(self):
-                return u''
-
-        for k in DummyDeleteForm.base_fields:
-            del DummyDeleteForm.base_fields[k]
-
-
-        return DummyDeleteForm
+        return get_delete_form_class(self.model,
+                                     getattr(self, 'form_class', Form))
 
     def get_form(self, form_class):
         form = form_class(**self.get_form_kwargs())
         form.instance = self.get_object()
         form.submit_name = self.get_submit_name()
-        return form
+        return self.add_captcha_field(form)
     
     def get_initial(self):
         return {}
@@ -0,0 +1,192 @@
+import threading
+from types import FunctionType, MethodType
+
+from django.template import TemplateDoesNotExist
+from django.template.context import BaseContext
+from django.template.loader import get_template
+from django.utils.encoding import force_unicode
+from django.utils.safestring import SafeData, mark_safe
+
+from . import settings
+from .caches import BoundedCache
+from .registry import registry
+
+
+class DjangoTemplates(object):
+    def get_template(self, name):
+        return get_template(name)
+
+
+def jinja2_finalize(value):
+    '''
+        django safe strings, forms, errors and media are rendered
+        unescaped by autoescaping environment, like in django templates
+    '''
+    from jinja2 import Markup
+    if isinstance(value, SafeData):
+        return Markup(value)
+    if value is None or isinstance(value, basestring) \
+            or hasattr(value, '__html__'):
+        return value
+    text = force_unicode(value)
+    if isinstance(text, SafeData):
+        return Markup(text)
+    return text
+
+
+def resolve_context_value(value):
+    '''
+        functions in context (lazy values like public_form_content)
+        are called as django template engine calls them,
+        values of dicts are resolved too
+    '''
+    if isinstance(value, (FunctionType, MethodType)) \
+            and not getattr(value, 'do_not_call_in_templates', False):
+        try:
+            return value()
+        except TypeError:
+            #function needs arguments, template calls it
+            return value
+    if type(value) is dict:
+        return dict((key, resolve_context_value(item)) \
+                        for key, item in value.iteritems())
+    return value
+
+
+class Jinja2Template(object):
+    '''jinja2 template rendered with django Context as django template is'''
+    def __init__(self, template):
+        self.template = template
+        self.name = template.name
+
+    def render(self, context=None):
+        if isinstance(context, BaseContext):
+            data = {}
+            #top of the stack wins
+            for context_dict in context.dicts:
+                data.update(context_dict)
+        else:
+            data = dict(context or {})
+        return mark_safe(self.template.render(
+                                    resolve_context_value(data)))
+
+
+class Jinja2Templates(object):
+    '''
+        templates from TEMPLATE_DIRS and application template directories
+        compiled by one jinja2 environment, created on first use;
+        settings.PUBLIC_FORMS_JINJA2_ENVIRONMENT is passed to environment,
+        csrf token of RequestContext is available as {{ csrf_token }}
+    '''
+    def __init__(self):
+        self._environment = None
+        self._lock = threading.Lock()
+
+    def get_environment_options(self):
+        from jinja2 import FileSystemLoader
+        from django.template.loaders.app_directories import app_template_dirs
+        options = {'autoescape':True,
+                   'auto_reload':settings.DEBUG or settings.TEMPLATE_DEBUG,
+                   'finalize':jinja2_finalize,
+                   'loader':FileSystemLoader(list(settings.TEMPLATE_DIRS)\
+                                                + list(app_template_dirs))}
+        options.update(settings.PUBLIC_FORMS_JINJA2_ENVIRONMENT)
+        return options
+
+    def get_environment(self):
+        if self._environment is None:
+            from jinja2 import Environment
+            with self._lock:
+                if self._environment is None:
+                    self._environment = Environment(
+                                            **self.get_environment_options())
+        return self._environment
+
+    def get_template(self, name):
+        from jinja2 import TemplateNotFound
+        try:
+            return Jinja2Template(self.get_environment().get_template(name))
+        except TemplateNotFound:
+            raise TemplateDoesNotExist(name)
+
+template_backend_classes = {'django':DjangoTemplates,
+                            'jinja2':Jinja2Templates}
+_template_backends = {}
+
+
+def get_template_backend(alias):
+    '''backend for 'django', 'jinja2' or dotted path of backend class'''
+    try:
+        return _template_backends[alias]
+    except KeyError:
+        backend_class = template_backend_classes.get(alias) \
+                or registry.resolve_setting(alias,
+                                            'PUBLIC_FORMS_TEMPLATE_BACKEND')
+        backend = _template_backends[alias] = backend_class()
+        return backend
+
+
+class TemplateCache(object):
+    '''
+        process wide cache of compiled templates and of
+        template name lists resolved to templates, misses are cached too,
+        bypassed when DEBUG or TEMPLATE_DEBUG is on,
+        so edited templates are picked up while developing;
+        templates are loaded by settings.PUBLIC_FORMS_TEMPLATE_BACKEND
+    '''
+    def __init__(self, max_size=1024):
+        self._templates = BoundedCache(max_size)
+        self._selected = BoundedCache(max_size)
+
+    def is_enabled(self):
+        return not (settings.DEBUG or settings.TEMPLATE_DEBUG)
+
+    def clear(self):
+        self._templates.clear()
+        self._selected.clear()
+
+    def get_backend(self):
+        return get_template_backend(settings.PUBLIC_FORMS_TEMPLATE_BACKEND)
+
+    def get_template(self, name):
+        if not self.is_enabled():
+            return self.get_backend().get_template(name)
+        key = (settings.PUBLIC_FORMS_TEMPLATE_BACKEND, name)
+        template = self._templates.get(key, False)
+        if template is False:
+            try:
+                template = self.get_backend().get_template(name)
+            except TemplateDoesNotExist:
+                #template is not found, each lookup stats every template dir
+                template = None
+            self._templates.set(key, template)
+        if template is None:
+            raise TemplateDoesNotExist(name)
+        return template
+
+    def select_template(self, names):
+        if isinstance(names, basestring):
+            return self.get_template(names)
+        if not self.is_enabled():
+            return self.find_template(names)
+        key = (settings.PUBLIC_FORMS_TEMPLATE_BACKEND, tuple(names))
+        template = self._selected.get(key, False)
+        if template is False:
+            try:
+                template = self.find_template(names)
+            except TemplateDoesNotExist:
+                template = None
+            self._selected.set(key, template)
+        if template is None:
+            raise TemplateDoesNotExist(', '.join(names))
+        return template
+
+    def find_template(self, names):
+        for name in names:
+            try:
+                return self.get_template(name)
+            except TemplateDoesNotExist:
+                continue
+        raise TemplateDoesNotExist(', '.join(names))
+
+template_cache = TemplateCache()
@@ -0,0 +1,30 @@
+from django.utils.translation import get_language_from_request
+
+
+class RequestState(object):
+    '''
+        request scoped values which every form of a page needs,
+        resolved once per request
+    '''
+    request_attr = '_public_forms_state'
+
+    @classmethod
+    def for_request(cls, request):
+        state = getattr(request, cls.request_attr, None)
+        if state is None:
+            state = cls(request)
+            setattr(request, cls.request_attr, state)
+        return state
+
+    def __init__(self, request):
+        self.is_authenticated = request.user.is_authenticated()
+        self.language = get_language_from_request(request)
+        self.processors_context = {}
+
+    def get_processor_context(self, processor, request):
+        '''result of context processor, which is run once per request'''
+        try:
+            return self.processors_context[processor]
+        except KeyError:
+            context = self.processors_context[processor] = processor(request)
+            return context
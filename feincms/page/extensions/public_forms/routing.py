@@ -0,0 +1,24 @@
+from itertools import chain
+
+
+class RequestRouter(object):
+    '''
+        request scoped index of submitted names, every form
+        of a page learns whether it owns the request with one set lookup
+        instead of merging GET and POST through request.REQUEST
+    '''
+    request_attr = '_public_forms_router'
+
+    @classmethod
+    def for_request(cls, request):
+        router = getattr(request, cls.request_attr, None)
+        if router is None:
+            router = cls(request)
+            setattr(request, cls.request_attr, router)
+        return router
+
+    def __init__(self, request):
+        self.submit_names = frozenset(chain(request.GET, request.POST))
+
+    def owns(self, submit_name):
+        return submit_name in self.submit_names
@@ -1,36 +1,88 @@
 import os
+import sys
+import time
 from random import choice
 from importlib import import_module
 from inspect import getmembers
 from tempfile import mkstemp
 import subprocess
+import resource
+import gc
+import weakref
+from threading import Thread
+from StringIO import StringIO
 
 
 
 from django.test import TestCase
+from django.utils import unittest
 from django.contrib.contenttypes.models import ContentType
 from django.test.client import Client
 from django.test.client import RequestFactory
 from django.contrib.sites.models import Site
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.models import Group, Permission, User
-from django.forms import ModelForm, Media
+from django import forms
+from django.forms import Form, ModelForm, Media
 from django.forms.models import BaseInlineFormSet
+from django.forms.util import ErrorList
 from django.db import models
 
 from django.test.simple import DjangoTestSuiteRunner
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import translation
+from django.utils.safestring import mark_safe
+from django.template import TemplateDoesNotExist, RequestContext, Context
 from captcha.fields import ReCaptchaFieldAjax
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
 
 from feincms.module.page.models import Page
 
 from feincms.page.extensions.variative_renderer.renderers import RendererSelectionWrapper
 
-from .models import PublicForm
+from .models import (PublicForm,
+                     contents_targeting,
+                     indexed_content_types,
+                     index_together_supported,
+                     OBJECT_INDEX,
+                     create_object_indexes,
+                     created_object_indexes,
+                     object_index_name)
 from .renderers import (CreatePublicForm, 
                         UpdatePublicForm, 
                         DeletePublicForm,
-                        CAPTCHA_PASSED_SESSION_KEY)
-from . import settings
+                        CAPTCHA_PASSED_SESSION_KEY,
+                        BasePresentationPublicForm,
+                        build_delete_form_class,
+                        get_delete_form_class,
+                        get_required_fields_json)
+from . import settings, LazySettings
+from .registry import Registry, registry
+from .content_types import content_types
+from .loading import (ContentObjectLoader,
+                      content_object_cache,
+                      fetch_objects)
+from .warmup import (warm_up,
+                     preload,
+                     describe_content,
+                     get_warm_up_request)
+from .memory import memory_usage, workers_memory_report
+from .media import freeze_media
+from .routing import RequestRouter
+from .request_state import RequestState
+from . import rendering
+from .rendering import (TemplateCache,
+                        template_cache,
+                        DjangoTemplates,
+                        Jinja2Template,
+                        jinja2_finalize)
+from .widgets import TemplateWidget
+from .render_plans import render_plan_form_class, RenderPlanFormMixin
+from .fragments import fragment_cache
 
 
 #pf - public form
@@ -107,6 +159,7 @@ class FeincmsPageTestCase(TestCase):
             if os.path.exists(template_path):
                 os.remove(template_path)
         self.template_pathes = []
+        template_cache.clear()
 
     def setup_request_factory(self):
             self.factory = RequestFactory()
@@ -144,6 +197,8 @@ class FeincmsPageTestCase(TestCase):
             self.template_pathes = []
 
         self.template_pathes += template_path,
+        #same template pathes are written by different tests
+        template_cache.clear()
 
     def setup_page(self, title='test22'):
         for p in Page.objects.all():
@@ -402,6 +457,141 @@ class RequirementsTest(TestCase):
     def test_variative_importable(self):
         from feincms.page.extensions import variative_renderer
 
+class LazySettingsTest(TestCase):
+    def test_falsy_settings_are_not_looked_up_in_django_settings(self):
+        lazy_settings = LazySettings()
+        self.assert_(lazy_settings.PUBLIC_FORMS_DEFAULT_ENABLE_CAPTCHA_ALWAYS \
+                        is False)
+        self.assert_(lazy_settings.PUBLIC_FORMS_EXCLUDE_CONTENT_TYPES == [])
+
+    def test_unprefixed_settings_are_looked_up_in_django_settings(self):
+        from django.conf import settings as django_settings
+        self.assert_(settings.INSTALLED_APPS is django_settings.INSTALLED_APPS)
+
+    def test_snapshot_is_read_only(self):
+        snapshot = settings.snapshot
+        self.assertRaises(AttributeError, setattr, snapshot, 
+                          'PUBLIC_FORMS_CAPTCHA_FIELD_NAME', 'other')
+        self.assertRaises(AttributeError, setattr, snapshot, 
+                          'PUBLIC_FORMS_UNKNOWN', 'other')
+
+    def test_snapshot_rebuilt_after_reset(self):
+        lazy_settings = LazySettings()
+        snapshot = lazy_settings.snapshot
+        self.assert_(lazy_settings.snapshot is snapshot)
+        lazy_settings._reset()
+        self.assert_(lazy_settings.snapshot is not snapshot)
+
+    def test_values_cached_on_instance_until_reset(self):
+        lazy_settings = LazySettings()
+        value = lazy_settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME
+        self.assert_(lazy_settings.__dict__['PUBLIC_FORMS_CAPTCHA_FIELD_NAME'] \
+                        == value)
+        self.assert_('INSTALLED_APPS' not in lazy_settings.__dict__)
+        lazy_settings._reset()
+        self.assert_('PUBLIC_FORMS_CAPTCHA_FIELD_NAME' \
+                        not in lazy_settings.__dict__)
+
+    def test_every_instance_reset_on_setting_changed(self):
+        try:
+            from django.test.utils import override_settings
+        except ImportError:
+            return
+        lazy_settings = LazySettings()
+        lazy_settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME
+        settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME
+        with override_settings(PUBLIC_FORMS_CAPTCHA_FIELD_NAME='other_captcha'):
+            self.assert_(lazy_settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME == \
+                            'other_captcha')
+            self.assert_(settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME == \
+                            'other_captcha')
+
+    def test_snapshot_rebuilt_on_setting_changed(self):
+        try:
+            from django.test.utils import override_settings
+        except ImportError:
+            return
+        snapshot = settings.snapshot
+        with override_settings(PUBLIC_FORMS_CAPTCHA_FIELD_NAME='other_captcha'):
+            self.assert_(settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME == 'other_captcha')
+        self.assert_(settings.snapshot is not snapshot)
+        self.assert_(settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME == \
+                        snapshot.PUBLIC_FORMS_CAPTCHA_FIELD_NAME)
+
+    def test_concurrent_load_builds_one_snapshot(self):
+        lazy_settings = LazySettings()
+        snapshots = []
+        def load():
+            lazy_settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME
+            snapshots.append(lazy_settings.snapshot)
+
+        threads = [Thread(target=load) for i in xrange(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assert_(len(snapshots) == 10)
+        self.assert_(len(set(id(snapshot) for snapshot in snapshots)) == 1)
+
+class RegistryTest(TestCase):
+    def test_resolve_is_memoized(self):
+        test_registry = Registry()
+        path = 'feincms.page.extensions.public_forms.renderers.CreatePublicForm'
+        self.assert_(test_registry.resolve(path) is CreatePublicForm)
+        self.assert_(path in test_registry._objects)
+        self.assert_(test_registry.resolve(path) is CreatePublicForm)
+
+    def test_bad_paths_are_configuration_errors(self):
+        test_registry = Registry()
+        for path in ('feincms.page.extensions.public_forms.renderers.Unknown',
+                     'feincms.page.extensions.unknown_module.Unknown',
+                     '.Unknown'):
+            self.assertRaises(ImproperlyConfigured, 
+                              test_registry.resolve_setting, path, 'SETTING')
+        self.assertRaises(ImproperlyConfigured,
+                          test_registry.check_renderers, PublicForm,
+                          ['feincms.page.extensions.public_forms.settings'])
+
+    def test_renderer_choices_resolved(self):
+        test_registry = Registry()
+        test_registry.check_renderers(PublicForm, PublicForm.renderer_choices)
+        self.assert_(test_registry.resolve(PublicForm.renderer_choices[2]) \
+                        is DeletePublicForm)
+
+class ContentTypeMapTest(TestCase):
+    def test_map_loaded_with_one_query(self):
+        content_types.clear()
+        with self.assertNumQueries(1):
+            site_ct_id = content_types.id_for_model(Site)
+            group_ct_id = content_types.id_for_model(Group)
+            self.assert_(content_types.model_for_id(site_ct_id) is Site)
+            self.assert_(content_types.model_for_id(group_ct_id) is Group)
+            self.assert_(content_types.content_type_for_id(site_ct_id).model \
+                            == 'site')
+        self.assert_(site_ct_id == ContentType.objects.get_for_model(Site).id)
+
+    def test_map_cleared_when_content_types_change(self):
+        content_types.load()
+        content_type = ContentType.objects.create(app_label='public_forms_tests',
+                                                  model='unknown',
+                                                  name='unknown')
+        self.assert_(not content_types._loaded)
+        self.assert_(content_types.model_for_id(content_type.id) is None)
+        content_type.delete()
+        self.assert_(not content_types._loaded)
+
+    def test_content_object_resolved_through_map(self):
+        pf_ct = module_content_type(Page, PublicForm)
+        pf = pf_ct(content_type=ContentType.objects.get_for_model(Site),
+                   object_id=1)
+        site = Site.objects.get(id=1)
+        content_types.load()
+        with self.assertNumQueries(1):
+            self.assert_(pf.content_object == site)
+        with self.assertNumQueries(0):
+            pf.content_object
+
 class CreatePublicFormsTest(FeincmsPageTestCase):
     def test_get_object_returns_none(self):
         pf_kwargs = {
@@ -1631,6 +1821,10 @@ class RendererMediaTest(CRUDTest):
                                 """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
                                )
 
+    media_regression_renders = 300
+    #Kb
+    media_regression_rss_growth = 2*1024
+
     def test_create_public_form_media(self):
         class TestFormClass(ModelForm):
             class Meta:
@@ -1667,6 +1861,40 @@ class RendererMediaTest(CRUDTest):
                           "form/class/media.js"):
             self.assert_(mediapath in response.content)
 
+    def test_media_does_not_grow_between_renders(self):
+        class TestRenderer(CreatePublicForm):
+            media = Media(
+                        css={'all': ('renderer/media.css',),},
+                        js=('renderer/media.js',),
+                        )
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+
+        def page_media():
+            return self.client.get(self.page._cached_url).content.split('!')[1]
+
+        media = page_media()
+        renderer_media_length = len(TestRenderer.media._js)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for i in xrange(self.media_regression_renders):
+            self.assert_(page_media() == media)
+        self.assert_(len(TestRenderer.media._js) == renderer_media_length)
+        self.assert_(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - \
+                        maxrss < self.media_regression_rss_growth)
+
+    def test_shared_media_is_immutable(self):
+        media = freeze_media(Media(js=('a.js',)), Media(js=('a.js', 'b.js')))
+        self.assert_(list(media._js) == ['a.js', 'b.js'])
+        self.assertRaises(TypeError, media.add_js, ('c.js',))
+        self.assert_(list((media + Media(js=('c.js',)))._js) == \
+                                                    ['a.js', 'b.js', 'c.js'])
+        self.assert_(list(media._js) == ['a.js', 'b.js'])
+
     def test_update_public_form_media(self):
         class TestFormClass(ModelForm):
             class Meta:
@@ -1915,6 +2143,65 @@ class TestFKInlineFormsets(CRUDTest):
                      BaseInlineFormSet))
 
 
+    def test_media_collected_without_forms(self):
+        class InlineForm(ModelForm):
+            class Media:
+                js=('inline/form/media.js',)
+
+        class TestRenderer(CreatePublicForm):
+            media = Media(js=('renderer/media.js',))
+            inlines = [(Permission, {}),]
+
+            def get_form(self, form_class):
+                raise AssertionError('form is built for media')
+
+            def get_formset_class(self, form_class, parent, through,
+                                  factory_kwargs):
+                return super(TestRenderer, self).get_formset_class(InlineForm,
+                                                        parent, through,
+                                                        factory_kwargs)
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+
+        request = self.factory.get(self.page._cached_url)
+        self.create_pf_ct.process(request)
+        media = unicode(self.create_pf_ct.media)
+        self.assert_('renderer/media.js' in media)
+        self.assert_('inline/form/media.js' in media)
+
+    def test_formset_classes_built_once(self):
+        factory_calls = []
+        class TestRenderer(UpdatePublicForm):
+            inlines = [(Permission, {'extra':1, 'exclude':['codename']}),]
+
+            @property
+            def formset_factory(self):
+                from django.forms.models import inlineformset_factory
+                def factory(*args, **kwargs):
+                    factory_calls.append(args)
+                    return inlineformset_factory(*args, **kwargs)
+                return factory
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.update_pf_ct.variation = 'TestRenderer'
+        self.update_pf_ct.save()
+
+        self.client.get(self.page._cached_url)
+        calls_n = len(factory_calls)
+        self.assert_(calls_n)
+        for i in xrange(3):
+            response = self.client.get(self.page._cached_url)
+            self.assert_('permissions' in response.content)
+        self.assert_(len(factory_calls) == calls_n)
+
     def test_update_public_form_inlines_with_add_inline(self):
         class TestRenderer(UpdatePublicForm):
             pass
@@ -2019,6 +2306,45 @@ class TestFKInlineFormsets(CRUDTest):
                      BaseInlineFormSet))
 
 
+    def test_render_plans_cover_formset_forms(self):
+        class PlainRenderer(CreatePublicForm):
+            inlines = [(Permission,{}),]
+
+        class PlanRenderer(PlainRenderer):
+            use_render_plans = True
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([PlainRenderer, PlanRenderer]\
+                                                    +pf_ct.renderer_choices)
+        self.setup_crud_page()
+        prefix = 'test22_first_col_0'
+        data = {'%s-model'%prefix:'',
+                '%s-0-name'%prefix:'<name>',
+                '%s-0-codename'%prefix:'',
+                '%s-TOTAL_FORMS'%prefix:'2',
+                '%s-INITIAL_FORMS'%prefix:'0',
+                '%s-MAX_NUM_FORMS'%prefix:'',
+                '%s_create'%prefix:'submit'}
+
+        outputs = {}
+        for variation in ('PlainRenderer', 'PlanRenderer'):
+            self.create_pf_ct.variation = variation
+            self.create_pf_ct.save()
+            for request in (self.factory.get(self.page._cached_url),
+                            self.factory.post(self.page._cached_url, data=data)):
+                self.create_pf_ct.process(request)
+                formsets = self.create_pf_ct.render.dispatch_method(
+                                                'get_formsets', request)()
+                outputs.setdefault(variation, []).append(
+                    [unicode(formset) for formset in formsets.values()])
+                self.assert_(all(issubclass(formset.form,
+                                            RenderPlanFormMixin) \
+                                    for formset in formsets.values()) == \
+                                (variation == 'PlanRenderer'))
+        self.assert_('errorlist' in outputs['PlainRenderer'][1][0])
+        self.assert_(outputs['PlainRenderer'] == outputs['PlanRenderer'])
+
 class TestMTMForwardInlineFormsets(CRUDTest):
     model_content_type = ContentType.objects.get_for_model(Permission)
     def create_templates(self):
@@ -2865,4 +3191,1220 @@ class InheritedModels(FeincmsPageTestCase):
          'ordering':0}
         sub_pf = sub_pf_class(sub_pf_kwargs)
         self.assert_(sub_pf.object_id == 1)
-        self.assert_(sub_pf.content_type.model_class() == Group)
\ No newline at end of file
+        self.assert_(sub_pf.content_type.model_class() == Group)
+
+class WarmUpTest(CRUDTest):
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
+                               )
+
+    def test_warm_up_reports_every_form(self):
+        self.setup_crud_page()
+        report = warm_up()
+        self.assert_(len(report) == 3)
+        for content, elapsed, error in report:
+            self.assert_(error is None)
+            self.assert_(elapsed >= 0)
+        self.assert_(set(content.pk for content, elapsed, error in report) == \
+                     set((self.create_pf_ct.pk, 
+                          self.update_pf_ct.pk, 
+                          self.delete_pf_ct.pk)))
+
+    def test_warm_up_reports_errors(self):
+        class FailingRenderer(CreatePublicForm):
+            def process(self, request, **kwargs):
+                raise ValueError('warm up failure')
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([FailingRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'FailingRenderer'
+        self.create_pf_ct.save()
+
+        report = warm_up()
+        self.assert_(len(report) == 3)
+        errors = dict((content.pk, error) for content, elapsed, error in report)
+        self.assert_(isinstance(errors[self.create_pf_ct.pk], ValueError))
+        self.assert_(errors[self.update_pf_ct.pk] is None)
+        self.assertRaises(ValueError, warm_up, raise_errors=True)
+
+    def test_warm_up_command(self):
+        self.setup_crud_page()
+        stdout = StringIO()
+        call_command('warmup_public_forms', stdout=stdout)
+        out = stdout.getvalue()
+        self.assert_('3 public forms warmed up' in out)
+        for content in (self.create_pf_ct, self.update_pf_ct, self.delete_pf_ct):
+            self.assert_(describe_content(content) in out)
+
+    def test_preload(self):
+        self.setup_crud_page()
+        report = preload()
+        self.assert_(len(report) == 3)
+        self.assert_(all(error is None for content, elapsed, error in report))
+
+
+class MemoryReportTest(TestCase):
+    def test_memory_usage(self):
+        if not os.path.exists('/proc/self/smaps'):
+            return
+        usage = memory_usage()
+        self.assert_(usage['Rss'] > 0)
+        self.assert_(usage['shared'] + usage['private'] == usage['Rss'])
+
+    def test_workers_memory_report(self):
+        if not os.path.exists('/proc/self/smaps'):
+            return
+        worker = subprocess.Popen('sleep 5', shell=True)
+        try:
+            report = dict(workers_memory_report(os.getpid()))
+            self.assert_(os.getpid() in report)
+            self.assert_(worker.pid in report)
+        finally:
+            worker.kill()
+            worker.wait()
+
+
+class ContentObjectLoaderTest(CRUDTest):
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
+                               )
+
+    def test_page_content_objects_loaded_with_one_query(self):
+        self.setup_crud_page()
+        page = Page.objects.get(pk=self.page.pk)
+        contents = list(page.content.all_of_type(self.pf_ct))
+        self.assert_(len(contents) == 3)
+        content_types.load()
+        loader = ContentObjectLoader()
+        with self.assertNumQueries(1):
+            loader.load_page(page)
+        with self.assertNumQueries(0):
+            loader.load_page(page)
+            objects = dict((content.variation, content.content_object) \
+                                for content in contents)
+        self.assert_(objects['CreatePublicForm'] is None)
+        self.assert_(objects['UpdatePublicForm'] == Site.objects.get(id=1))
+        self.assert_(objects['UpdatePublicForm'] == objects['DeletePublicForm'])
+        #forms write posted values to their own instances
+        self.assert_(objects['UpdatePublicForm'] is not objects['DeletePublicForm'])
+
+    def test_invalid_post_does_not_leak_to_sibling_forms(self):
+        self.create_pf_kwargs = dict(self.create_pf_kwargs,
+                                     variation='UpdatePublicForm',
+                                     object_id=1)
+        self.setup_crud_page()
+        site = Site.objects.get(id=1)
+        site.name = 'stored'
+        site.save()
+        response = self.client.post(self.page._cached_url,
+                            data={'test22_second_col_0-domain':'',
+                                  'test22_second_col_0-name':'leaked',
+                                  'test22_second_col_0_update':'submit'})
+        self.assert_('errorlist' in response.content)
+        self.assert_(response.content.count('value="leaked"') == 1)
+        #presentation form of the same object shows stored values
+        self.assert_(response.content.count('value="stored"') == 1)
+
+    def test_loader_is_request_scoped(self):
+        request = self.factory.get(self.page._cached_url)
+        loader = ContentObjectLoader.for_request(request)
+        self.assert_(ContentObjectLoader.for_request(request) is loader)
+        other_request = self.factory.get(self.page._cached_url)
+        self.assert_(ContentObjectLoader.for_request(other_request) is not loader)
+
+    def test_prefetch_hook_called_once_per_class(self):
+        calls = []
+        class PrefetchingPublicForm(PublicForm):
+            def get_content_object(self, field_getter):
+                return field_getter(self, type(self))
+
+            @classmethod
+            def prefetch_content_objects(cls, contents, loader):
+                calls.append(len(contents))
+                loader.get_many(Site, [1])
+
+            class Meta:
+                abstract = True
+
+        Page.create_content_type(PrefetchingPublicForm)
+        DjangoTestSuiteRunner().setup_databases()
+        content_class = module_content_type(Page, PrefetchingPublicForm)
+        contents = [content_class(parent=self.page, region='first_col',
+                                  ordering=i, variation='UpdatePublicForm',
+                                  content_type=self.model_content_type,
+                                  object_id=1) for i in xrange(3)]
+        for content in contents:
+            content.save()
+        loader = ContentObjectLoader()
+        loader.load(contents)
+        loader.load(contents)
+        self.assert_(calls == [3])
+        with self.assertNumQueries(0):
+            self.assert_(contents[0].content_object == contents[2].content_object)
+
+
+class ContentObjectCacheTest(CRUDTest):
+    def create_templates(self):
+        pass
+
+    def setUp(self):
+        super(ContentObjectCacheTest, self).setUp()
+        from django.core.cache.backends.locmem import LocMemCache
+        self.backend = LocMemCache('public_forms_tests', {})
+        self.orig_get_backend = content_object_cache.get_backend
+        content_object_cache.get_backend = lambda:self.backend
+        content_types.load()
+
+    def tearDown(self):
+        content_object_cache.get_backend = self.orig_get_backend
+        self.backend.clear()
+        super(ContentObjectCacheTest, self).tearDown()
+
+    def test_objects_cached_between_requests(self):
+        with self.assertNumQueries(1):
+            site = fetch_objects(Site, [1])[1]
+        with self.assertNumQueries(0):
+            self.assert_(fetch_objects(Site, [1])[1] == site)
+            other_loader = ContentObjectLoader()
+            self.assert_(other_loader.get_many(Site, [1])[1] == site)
+
+    def test_cache_invalidated_on_save(self):
+        self.setup_crud_page()
+        site = fetch_objects(Site, [1])[1]
+        site.name = 'renamed'
+        site.save()
+        with self.assertNumQueries(1):
+            self.assert_(fetch_objects(Site, [1])[1].name == 'renamed')
+
+    def test_deleted_objects_cached_as_misses(self):
+        self.setup_crud_page()
+        site = Site.objects.create(domain='deleted.example.com', name='deleted')
+        site_id = site.id
+        self.assert_(fetch_objects(Site, [site_id])[site_id] == site)
+        site.delete()
+        with self.assertNumQueries(0):
+            self.assert_(fetch_objects(Site, [site_id])[site_id] is None)
+
+    def test_cache_disabled_by_default(self):
+        self.assert_(self.orig_get_backend() is None)
+
+    def test_saves_do_not_look_up_content_types(self):
+        orig_id_for_model = content_types.id_for_model
+        def id_for_model(model):
+            raise AssertionError('%s content type looked up'%model)
+        content_types.id_for_model = id_for_model
+        try:
+            group = Group.objects.create(name='untargeted')
+            group.delete()
+        finally:
+            content_types.id_for_model = orig_id_for_model
+
+    def test_proxy_save_invalidates_concrete_objects(self):
+        class ProxySite(Site):
+            class Meta:
+                proxy = True
+
+        self.assert_(fetch_objects(Site, [1])[1].name != 'renamed by proxy')
+        proxy = ProxySite.objects.get(id=1)
+        proxy.name = 'renamed by proxy'
+        proxy.save()
+        with self.assertNumQueries(1):
+            self.assert_(fetch_objects(Site, [1])[1].name == 'renamed by proxy')
+        with self.assertNumQueries(1):
+            self.assert_(type(fetch_objects(ProxySite, [1])[1]) is ProxySite)
+
+
+class ObjectIndexTest(CRUDTest):
+    def create_templates(self):
+        pass
+
+    def test_generated_content_types_have_object_index(self):
+        from django.db import connection
+        pf_ct = module_content_type(Page, PublicForm)
+        self.assert_(pf_ct in indexed_content_types)
+        if index_together_supported:
+            self.assert_(OBJECT_INDEX in pf_ct._meta.index_together)
+        if getattr(connection, 'vendor', None) != 'sqlite':
+            return
+        self.assert_(['content_type_id', 'object_id'] in \
+                        self.get_sqlite_indexes(pf_ct._meta.db_table))
+
+    def get_sqlite_indexes(self, table):
+        from django.db import connection
+        cursor = connection.cursor()
+        cursor.execute('PRAGMA index_list(%s)'%connection.ops.quote_name(table))
+        indexes = []
+        for index in cursor.fetchall():
+            cursor.execute('PRAGMA index_info(%s)'%\
+                                    connection.ops.quote_name(index[1]))
+            indexes += [row[2] for row in cursor.fetchall()],
+        return indexes
+
+    def test_fallback_index_created_once_per_syncdb(self):
+        from django.db import connection, DEFAULT_DB_ALIAS
+        from django.contrib.sites import models as sites_models
+        from django.contrib.auth import models as auth_models
+        if getattr(connection, 'vendor', None) != 'sqlite':
+            return
+        pf_ct = module_content_type(Page, PublicForm)
+        table = pf_ct._meta.db_table
+        connection.cursor().execute('DROP INDEX IF EXISTS %s'%\
+                connection.ops.quote_name(object_index_name(pf_ct, connection)))
+        created_object_indexes.discard((DEFAULT_DB_ALIAS, table))
+        indexes = self.get_sqlite_indexes(table)
+        #post_syncdb is sent for every application with the same models
+        for sender in (sites_models, auth_models):
+            create_object_indexes(sender=sender, created_models=[pf_ct, Site],
+                                  db=DEFAULT_DB_ALIAS)
+        columns = ['content_type_id', 'object_id']
+        self.assert_(self.get_sqlite_indexes(table).count(columns) == \
+                        indexes.count(columns) + 1)
+        self.assert_((DEFAULT_DB_ALIAS, table) in created_object_indexes)
+
+    def test_contents_targeting_object(self):
+        self.setup_crud_page()
+        site = Site.objects.get(id=1)
+        self.assert_(set(content.pk for content in self.pf_ct.targeting(site)) == \
+                     set((self.update_pf_ct.pk, self.delete_pf_ct.pk)))
+        self.assert_(set(content.pk for content in contents_targeting(site)) == \
+                     set((self.update_pf_ct.pk, self.delete_pf_ct.pk)))
+        self.assert_(contents_targeting(Group(id=100500)) == [])
+
+
+class FormClassCacheTest(CRUDTest):
+    def create_templates(self):
+        pass
+
+    def get_form_class(self, content):
+        #fresh content has fresh renderer, as in new request
+        content = type(content).objects.get(pk=content.pk)
+        request = get_warm_up_request(self.page)
+        content.process(request)
+        return content.render.dispatch_method('get_form_class', request)()
+
+    def test_form_class_shared_between_requests(self):
+        self.setup_crud_page()
+        for content in (self.create_pf_ct, self.update_pf_ct, self.delete_pf_ct):
+            self.assert_(self.get_form_class(content) is \
+                                                self.get_form_class(content))
+        self.assert_(self.get_form_class(self.create_pf_ct) is not \
+                        self.get_form_class(self.delete_pf_ct))
+
+    def test_form_class_depends_on_language(self):
+        self.setup_crud_page()
+        form_class = self.get_form_class(self.create_pf_ct)
+        translation.activate('de')
+        try:
+            self.assert_(self.get_form_class(self.create_pf_ct) is not form_class)
+        finally:
+            translation.deactivate()
+        self.assert_(self.get_form_class(self.create_pf_ct) is form_class)
+
+
+class RecordingCaptchaField(forms.CharField):
+    def __init__(self, request=None, context=None, attrs=None, **kwargs):
+        self.request = request
+        super(RecordingCaptchaField, self).__init__(**kwargs)
+
+
+class CaptchaFormClassTest(CRUDTest):
+    threads_number = 8
+    forms_per_thread = 50
+
+    def create_templates(self):
+        pass
+
+    def setup_captcha_renderer(self):
+        class TestRenderer(CreatePublicForm):
+            captcha_field_class = RecordingCaptchaField
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.enable_captcha_always = True
+        self.create_pf_ct.save()
+
+    def build_form(self, content, results):
+        request = get_warm_up_request()
+        content.process(request)
+        form_class = content.render.dispatch_method('get_form_class', request)()
+        form = content.render.dispatch_method('get_form', request)(form_class)
+        results += (form_class, form, weakref.ref(request)),
+
+    def test_captcha_field_added_to_form_instances_only(self):
+        self.setup_captcha_renderer()
+        content = self.pf_ct.objects.get(pk=self.create_pf_ct.pk)
+        contents = [[self.pf_ct.objects.get(pk=content.pk) \
+                        for i in xrange(self.forms_per_thread)] \
+                            for j in xrange(self.threads_number)]
+        results = []
+        def build_forms(contents):
+            for content in contents:
+                self.build_form(content, results)
+
+        threads = [Thread(target=build_forms, args=(thread_contents,)) \
+                        for thread_contents in contents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        field_name = settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME
+        self.assert_(len(results) == self.threads_number*self.forms_per_thread)
+        form_classes = set(form_class for form_class, form, request in results)
+        self.assert_(len(form_classes) == 1)
+        form_class = form_classes.pop()
+        self.assert_(form_class.captcha_required)
+        self.assert_(field_name not in form_class.base_fields)
+        for form_class, form, request in results:
+            #each form is bound to request it was built for
+            self.assert_(form.fields[field_name].request is request())
+
+    def test_requests_not_kept_alive(self):
+        self.setup_captcha_renderer()
+        requests = []
+        for i in xrange(self.forms_per_thread):
+            results = []
+            self.build_form(self.pf_ct.objects.get(pk=self.create_pf_ct.pk),
+                            results)
+            requests += results[0][2],
+            del results
+        gc.collect()
+        self.assert_(all(request() is None for request in requests))
+
+
+    def test_captcha_delete_form_class_has_no_model_fields(self):
+        class TestFormClass(ModelForm):
+            class Meta:
+                model = Site
+
+        class TestRenderer(DeletePublicForm):
+            captcha_field_class = RecordingCaptchaField
+            form_class = TestFormClass
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.delete_pf_ct.variation = 'TestRenderer'
+        self.delete_pf_ct.enable_captcha_always = True
+        self.delete_pf_ct.save()
+
+        results = []
+        self.build_form(self.delete_pf_ct, results)
+        form_class, form, request = results[0]
+        self.assert_(form_class.captcha_required)
+        self.assert_(not form_class.base_fields)
+        self.assert_(form.fields.keys() == \
+                        [settings.PUBLIC_FORMS_CAPTCHA_FIELD_NAME])
+        self.assert_(get_required_fields_json(form_class) == '[]')
+
+class DeleteFormClassTest(TestCase):
+    benchmark_iterations = 1000
+
+    def test_delete_form_class_memoized(self):
+        class ParentForm(forms.Form):
+            field = forms.CharField()
+
+        form_class = get_delete_form_class(Site)
+        self.assert_(form_class is get_delete_form_class(Site, Form))
+        self.assert_(form_class is not get_delete_form_class(Group))
+        self.assert_(not form_class.base_fields)
+        parent_form_class = get_delete_form_class(Site, ParentForm)
+        self.assert_(parent_form_class is not form_class)
+        self.assert_(issubclass(parent_form_class, ParentForm))
+        self.assert_(not parent_form_class.base_fields)
+        self.assert_(ParentForm.base_fields.keys() == ['field'])
+        self.assert_(unicode(form_class()) == u'')
+
+    def test_delete_form_class_benchmark(self):
+        started = time.time()
+        for i in xrange(self.benchmark_iterations):
+            build_delete_form_class(Site, Form)
+        built = time.time() - started
+
+        get_delete_form_class(Site)
+        started = time.time()
+        for i in xrange(self.benchmark_iterations):
+            get_delete_form_class(Site)
+        cached = time.time() - started
+
+        sys.stdout.write('\nDummyDeleteForm x%d: built %.4fs, cached %.4fs\n'%\
+                            (self.benchmark_iterations, built, cached))
+        self.assert_(cached < built)
+
+
+class RendererPipelineTest(CRUDTest):
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
+                               )
+
+    def get_form(self, content, request):
+        form_class = content.render.dispatch_method('get_form_class', request)()
+        return content.render.dispatch_method('get_form', request)(form_class)
+
+    def test_pipelines_composed_once_per_class(self):
+        self.setup_crud_page()
+        for content in (self.create_pf_ct, self.update_pf_ct, self.delete_pf_ct):
+            submit_name = content.render.get_submit_name()
+            for data in ({}, {submit_name:'submit'}):
+                request = self.factory.get(self.page._cached_url, data=data)
+                content.process(request)
+                content.render(request=request)
+                for renderer in (content.render, content.render.presentation):
+                    for method_name, stages in renderer.pipelines:
+                        self.assert_(method_name not in renderer.__dict__)
+
+    def test_memoized_results_reset_per_request(self):
+        self.setup_crud_page()
+        request = self.factory.get(self.page._cached_url)
+        self.update_pf_ct.process(request)
+        form = self.get_form(self.update_pf_ct, request)
+        self.assert_(self.get_form(self.update_pf_ct, request) is form)
+
+        request = self.factory.get(self.page._cached_url)
+        self.update_pf_ct.process(request)
+        self.assert_(self.get_form(self.update_pf_ct, request) is not form)
+
+    def test_subclass_pipeline_runs_once(self):
+        calls = []
+        class TestRenderer(CreatePublicForm):
+            def get_form(self, form_class):
+                form = super(TestRenderer, self).get_form(form_class)
+                calls.append(form)
+                return form
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+
+        request = self.factory.post(self.page._cached_url,
+                            data={'test22_first_col_0-domain':'',
+                                  'test22_first_col_0-name':'',
+                                  'test22_first_col_0_create':'submit'})
+        content = self.pf_ct.objects.get(pk=self.create_pf_ct.pk)
+        content.process(request)
+        form = self.get_form(content, request)
+        self.assert_(self.get_form(content, request) is form)
+        self.assert_(calls == [form])
+        #formset validation is appended once
+        self.assert_(form.is_valid.func == content.render.is_formset_valid)
+        self.assert_(not form.is_valid())
+
+
+    def test_mixin_overrides_not_shadowed(self):
+        calls = []
+        class InheritingRenderer(CreatePublicForm):
+            pass
+
+        class OverridingRenderer(CreatePublicForm):
+            def get_form(self, form_class):
+                calls.append('overriding')
+                return super(OverridingRenderer, self).get_form(form_class)
+
+        class FormMixin(object):
+            def get_form(self, form_class):
+                calls.append('mixin')
+                return super(FormMixin, self).get_form(form_class)
+
+        class TestRenderer(FormMixin, InheritingRenderer, OverridingRenderer):
+            pass
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+
+        request = self.factory.post(self.page._cached_url,
+                            data={'test22_first_col_0-domain':'',
+                                  'test22_first_col_0-name':'',
+                                  'test22_first_col_0_create':'submit'})
+        content = self.pf_ct.objects.get(pk=self.create_pf_ct.pk)
+        content.process(request)
+        form = self.get_form(content, request)
+        self.assert_(self.get_form(content, request) is form)
+        self.assert_(calls == ['mixin', 'overriding'])
+        self.assert_(form.is_valid.func == content.render.is_formset_valid)
+        self.assert_(not form.is_valid())
+
+    def count_calls(self, function, *args):
+        calls = []
+        def profile(frame, event, arg):
+            if event == 'call':
+                calls.append(frame.f_code.co_name)
+        sys.setprofile(profile)
+        try:
+            function(*args)
+        finally:
+            sys.setprofile(None)
+        #setprofile(None) call itself is not counted
+        return calls
+
+    def test_pipeline_call_depth_benchmark(self):
+        self.setup_crud_page()
+        request = self.factory.get(self.page._cached_url)
+        self.update_pf_ct.process(request)
+        renderer = self.update_pf_ct.render.presentation
+        form_class = renderer.get_form_class()
+        first_calls = self.count_calls(renderer.get_form, form_class)
+        memoized_calls = self.count_calls(renderer.get_form, form_class)
+
+        gc.collect()
+        objects_before = len(gc.get_objects())
+        for i in xrange(1000):
+            renderer.get_form(form_class)
+        gc.collect()
+        allocated = len(gc.get_objects()) - objects_before
+
+        started = time.time()
+        for i in xrange(10000):
+            renderer.get_form(form_class)
+        elapsed = time.time() - started
+        sys.stdout.write('\nget_form: %d python calls first, %d memoized, '
+                         '%.2fus per memoized call, %d objects kept '
+                         'by 1000 calls\n'%(len(first_calls),
+                                              len(memoized_calls),
+                                              elapsed*100, allocated))
+        #wrapper and memoized stage only
+        self.assert_(len(memoized_calls) <= 2)
+        #memoized calls keep nothing alive
+        self.assert_(allocated < 10)
+
+
+class PresentationTest(CRUDTest):
+    forms_number = 30
+    renders_number = 5
+
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
+                               )
+
+    def test_presentation_reuses_dispatcher_state(self):
+        self.setup_crud_page()
+        request = self.factory.get(self.page._cached_url)
+        self.update_pf_ct.process(request)
+        renderer = self.update_pf_ct.render
+        presentation = renderer.presentation
+        self.assert_(isinstance(presentation, renderer.presentation_class))
+        self.assert_(presentation.instance is renderer.instance)
+        self.assert_(presentation.request is request)
+        self.assert_(presentation.template_name_suffix == '_update')
+        self.assert_(presentation.get_submit_name() == renderer.get_submit_name())
+        self.assert_(presentation.object == Site.objects.get(id=1))
+        self.assert_(renderer.presentation is presentation)
+
+    def test_custom_presentation_init_runs(self):
+        class TestPresentation(BasePresentationPublicForm):
+            def __init__(self, *args, **kwargs):
+                super(TestPresentation, self).__init__(*args, **kwargs)
+                self.initialized = True
+
+        class TestRenderer(UpdatePublicForm):
+            presentation_class = TestPresentation
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.update_pf_ct.variation = 'TestRenderer'
+        self.update_pf_ct.save()
+
+        request = self.factory.get(self.page._cached_url)
+        self.update_pf_ct.process(request)
+        renderer = self.update_pf_ct.render
+        presentation = renderer.presentation
+        self.assert_(presentation.initialized)
+        self.assert_(presentation.instance is renderer.instance)
+        self.assert_(presentation.request is request)
+        self.assert_(presentation.object == Site.objects.get(id=1))
+        self.assert_(u'value="example.com"' in \
+                        self.client.get(self.page._cached_url).content)
+
+    def test_page_with_many_forms_benchmark(self):
+        pf_ct = module_content_type(Page, PublicForm)
+        for ordering in xrange(self.forms_number):
+            pf_ct(parent=self.page, 
+                  region='first_col',
+                  enable_captcha_once=False,
+                  enable_captcha_always=False,
+                  enable_ajax=False,
+                  object_id=None,
+                  content_type=CRUDTest.model_content_type,
+                  variation='CreatePublicForm',
+                  ordering=ordering).save()
+        self.create_templates()
+
+        response = self.client.get(self.page._cached_url)
+        self.assert_(response.content.count('<form') == self.forms_number)
+        started = time.time()
+        for i in xrange(self.renders_number):
+            self.client.get(self.page._cached_url)
+        per_form = (time.time() - started)/self.renders_number/self.forms_number
+        sys.stdout.write('\npage with %d forms: %.2fms per form\n'%\
+                            (self.forms_number, per_form*1000))
+
+
+class RequestRouterTest(CRUDTest):
+    def create_templates(self):
+        pass
+
+    def test_router_built_once_per_request(self):
+        request = self.factory.post('/?test22_first_col_0_create=submit',
+                                    data={'test22_second_col_0_update':'submit'})
+        router = RequestRouter.for_request(request)
+        self.assert_(RequestRouter.for_request(request) is router)
+        self.assert_(router.owns('test22_first_col_0_create'))
+        self.assert_(router.owns('test22_second_col_0_update'))
+        self.assert_(not router.owns('test22_third_col_0_delete'))
+        self.assert_(RequestRouter.for_request(self.factory.get('/')) \
+                        is not router)
+
+    def test_owner_routed_once_per_request(self):
+        self.setup_crud_page()
+        request = self.factory.post(self.page._cached_url,
+                                    data={'test22_second_col_0_update':'submit'})
+        routed = []
+        for content in (self.create_pf_ct, self.update_pf_ct, self.delete_pf_ct):
+            orig_is_request_owner = content.render.is_request_owner
+            def is_request_owner(request, orig=orig_is_request_owner):
+                routed.append(request)
+                return orig(request)
+            content.render.is_request_owner = is_request_owner
+            for method_name in ('on_prepare', 'render', 'on_response'):
+                content.render.dispatch_method(method_name, request)
+        self.assert_(len(routed) == 3)
+        self.assert_(self.update_pf_ct.render.owns_request(request))
+        self.assert_(not self.create_pf_ct.render.owns_request(request))
+        self.assert_(not self.delete_pf_ct.render.owns_request(request))
+
+
+class DeferredPreparationTest(CRUDTest):
+    def create_templates(self):
+        pass
+
+    def test_presentation_prepared_on_first_use(self):
+        self.setup_crud_page()
+        content_types.load()
+        request = self.factory.get(self.page._cached_url)
+        request._feincms_page = self.page
+        contents = (self.create_pf_ct, self.update_pf_ct, self.delete_pf_ct)
+        with self.assertNumQueries(0):
+            for content in contents:
+                content.process(request)
+        self.assert_(self.page.contains_forms)
+        for content in contents:
+            self.assert_('object' not in content.render.presentation.__dict__)
+
+        self.assert_(self.update_pf_ct.render.presentation.object == Site(id=1))
+        #objects of all forms of the page are loaded together
+        with self.assertNumQueries(0):
+            self.assert_(self.delete_pf_ct.render.presentation.get_object() == \
+                            Site(id=1))
+        self.assert_(self.create_pf_ct.render.presentation.model is Site)
+
+    def test_owner_prepared_eagerly(self):
+        self.setup_crud_page()
+        request = self.factory.post(self.page._cached_url,
+                                    data={'test22_second_col_0_update':'submit'})
+        self.update_pf_ct.process(request)
+        self.assert_(self.update_pf_ct.render.__dict__['object'] == Site(id=1))
+        self.assert_(self.update_pf_ct.render.model is Site)
+
+
+class CaptchaConfigurationTest(FeincmsPageTestCase):
+    def test_required_fields_json_cached_per_form_class(self):
+        class TestForm(forms.Form):
+            first = forms.CharField()
+            optional = forms.CharField(required=False)
+            second = forms.CharField()
+
+        required_fields = get_required_fields_json(TestForm)
+        self.assert_(required_fields == '["first", "second"]')
+        self.assert_(get_required_fields_json(TestForm) is required_fields)
+
+    def test_request_state_resolved_once(self):
+        request = self.factory.get(self.page._cached_url,
+                                   HTTP_ACCEPT_LANGUAGE='de')
+        state = RequestState.for_request(request)
+        self.assert_(RequestState.for_request(request) is state)
+        self.assert_(not state.is_authenticated)
+        self.assert_(state.language == \
+                        translation.get_language_from_request(request))
+
+
+class RendererTemplateCacheTest(CRUDTest):
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                """<form method='POST'>{{form}}</form>""")
+        self.setup_template('content/sites/site_create_extra.html',
+                            """extra {{form}}""")
+
+    def setUp(self):
+        super(RendererTemplateCacheTest, self).setUp()
+        self.loaded = []
+        self.orig_get_template = rendering.get_template
+        def get_template(name):
+            self.loaded.append(name)
+            return self.orig_get_template(name)
+        rendering.get_template = get_template
+
+    def tearDown(self):
+        rendering.get_template = self.orig_get_template
+        super(RendererTemplateCacheTest, self).tearDown()
+
+    def test_template_names_extendable(self):
+        class TestRenderer(CreatePublicForm):
+            def get_template_names(self):
+                return ['content/sites/site_create_extra.html'] + \
+                        super(TestRenderer, self).get_template_names()
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+
+        for i in xrange(3):
+            self.assert_('extra <tr>' in \
+                            self.client.get(self.page._cached_url).content)
+        self.assert_(self.loaded.count('content/sites/site_create_extra.html') \
+                        == 1)
+
+
+class TemplateCacheTest(FeincmsPageTestCase):
+    def setUp(self):
+        super(TemplateCacheTest, self).setUp()
+        self.loaded = []
+        self.orig_get_template = rendering.get_template
+        def get_template(name):
+            self.loaded.append(name)
+            return self.orig_get_template(name)
+        rendering.get_template = get_template
+
+    def tearDown(self):
+        rendering.get_template = self.orig_get_template
+        super(TemplateCacheTest, self).tearDown()
+
+    def test_templates_compiled_once(self):
+        self.setup_template('public_forms_tests/cached.html', 'cached')
+        cache = TemplateCache()
+        template = cache.select_template(['public_forms_tests/missing.html',
+                                          'public_forms_tests/cached.html'])
+        self.assert_(cache.select_template(['public_forms_tests/missing.html',
+                                            'public_forms_tests/cached.html']) \
+                        is template)
+        self.assert_(cache.get_template('public_forms_tests/cached.html') \
+                        is template)
+        self.assert_(self.loaded == ['public_forms_tests/missing.html',
+                                     'public_forms_tests/cached.html'])
+
+    def test_misses_cached(self):
+        cache = TemplateCache()
+        for i in xrange(3):
+            self.assertRaises(TemplateDoesNotExist, cache.select_template,
+                              ['public_forms_tests/missing.html'])
+        self.assert_(self.loaded == ['public_forms_tests/missing.html'])
+
+    def test_cache_bypassed_in_debug(self):
+        from django.conf import settings as django_settings
+        self.setup_template('public_forms_tests/cached.html', 'cached')
+        cache = TemplateCache()
+        orig_debug = django_settings.DEBUG
+        django_settings.DEBUG = True
+        try:
+            for i in xrange(3):
+                cache.get_template('public_forms_tests/cached.html')
+        finally:
+            django_settings.DEBUG = orig_debug
+        self.assert_(len(self.loaded) == 3)
+
+
+processed_requests = []
+
+def counting_processor(request):
+    processed_requests.append(request)
+    return {'processed':'processed'}
+
+
+class WidgetContextTest(FeincmsPageTestCase):
+    def setUp(self):
+        super(WidgetContextTest, self).setUp()
+        del processed_requests[:]
+        self.setup_template('public_forms_tests/widget.html',
+                            '{{ processed }} {{ title }}')
+
+    def test_declared_processors_run_once_per_request(self):
+        class CountingWidget(TemplateWidget):
+            context_processors = (counting_processor,)
+
+        request = self.factory.get(self.page._cached_url)
+        for title in ('first', 'second'):
+            widget = CountingWidget(request=request,
+                                    templates='public_forms_tests/widget.html',
+                                    title=title)
+            self.assert_(widget.render('name', None) == 'processed %s'%title)
+        self.assert_(processed_requests == [request])
+
+        other_request = self.factory.get(self.page._cached_url)
+        CountingWidget(request=other_request,
+                       templates='public_forms_tests/widget.html',
+                       title='third').render('name', None)
+        self.assert_(processed_requests == [request, other_request])
+
+    def test_widget_variables_override_processors(self):
+        class CountingWidget(TemplateWidget):
+            context_processors = (counting_processor,)
+
+        request = self.factory.get(self.page._cached_url)
+        widget = CountingWidget(request=request,
+                                templates='public_forms_tests/widget.html',
+                                processed='widget', title='title')
+        self.assert_(widget.render('name', None) == 'widget title')
+
+    def test_request_context_by_default(self):
+        request = self.factory.get(self.page._cached_url)
+        widget = TemplateWidget(request=request,
+                                templates='public_forms_tests/widget.html',
+                                title='title')
+        self.assert_(isinstance(widget.get_context_data(), RequestContext))
+
+
+class RenderPlanTest(CRUDTest):
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
+                               )
+
+    def assert_same_output(self, form_class, **kwargs):
+        expected = form_class(**kwargs).as_table()
+        plan_form_class = render_plan_form_class(form_class)
+        #second render goes through cached plan
+        for i in xrange(2):
+            form = plan_form_class(**kwargs)
+            self.assert_(form.as_table() == expected)
+            self.assert_(unicode(form) == expected)
+
+    def test_output_identical_to_as_table(self):
+        class TestForm(forms.Form):
+            name = forms.CharField(max_length=10, help_text='Your <b>name</b>')
+            question = forms.CharField(label='Really?', required=False)
+            agree = forms.BooleanField()
+            choice = forms.ChoiceField(choices=(('a', 'A & B'), ('b', 'B')))
+            secret = forms.CharField(widget=forms.HiddenInput)
+            nolabel = forms.CharField(label='', required=False)
+
+            def clean(self):
+                raise forms.ValidationError('Whole form is <wrong>')
+
+        class CSSForm(TestForm):
+            error_css_class = 'error'
+            required_css_class = 'required'
+
+        for form_class in (TestForm, CSSForm):
+            self.assert_same_output(form_class)
+            self.assert_same_output(form_class, prefix='plan',
+                                    initial={'name':'initial"'})
+            self.assert_same_output(form_class, data={'name':'x'*20,
+                                                      'choice':'c'})
+            self.assert_same_output(form_class, prefix='plan',
+                                    data={'plan-name':'<name>',
+                                          'plan-agree':'on',
+                                          'plan-choice':'a',
+                                          'plan-secret':'s'})
+        self.assert_same_output(Form)
+        self.assert_same_output(Form, data={})
+
+    def test_model_form_output_identical_to_as_table(self):
+        class SiteForm(ModelForm):
+            class Meta:
+                model = Site
+        self.assert_same_output(SiteForm, prefix='test22_first_col_0',
+                                instance=Site.objects.get(id=1))
+        self.assert_same_output(SiteForm, prefix='test22_first_col_0',
+                                data={'test22_first_col_0-domain':'',
+                                      'test22_first_col_0-name':'b'})
+
+    def test_renderer_output_identical(self):
+        class TestRenderer(CreatePublicForm):
+            use_render_plans = True
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        data = {'test22_first_col_0-domain':'',
+                'test22_first_col_0-name':'b',
+                'test22_first_col_0_create':'submit'}
+        expected = self.client.post(self.page._cached_url, data=data).content
+
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+        self.assert_(self.client.post(self.page._cached_url,
+                                      data=data).content == expected)
+
+    def test_fields_changed_per_instance(self):
+        class TestForm(forms.Form):
+            name = forms.CharField(help_text='help')
+            secret = forms.CharField()
+
+            def __init__(self, label, *args, **kwargs):
+                super(TestForm, self).__init__(*args, **kwargs)
+                self.fields['name'].label = label
+                self.fields['name'].help_text = label
+                if label == 'hidden':
+                    self.fields['secret'].widget = forms.HiddenInput()
+
+        for label in ('first', 'second', 'hidden', 'first'):
+            self.assert_same_output(TestForm, label=label)
+
+    def test_form_class_key_includes_plans_flag(self):
+        class TestRenderer(CreatePublicForm):
+            def uses_render_plans(self, request):
+                return 'plans' in request.GET
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+        for data, planned in (({}, False), ({'plans':1}, True), ({}, False)):
+            request = self.factory.get(self.page._cached_url, data=data)
+            self.create_pf_ct.process(request)
+            form_class = self.create_pf_ct.render.dispatch_method(
+                                                'get_form_class', request)()
+            self.assert_(issubclass(form_class, RenderPlanFormMixin) == planned)
+
+    def test_plan_form_class_keeps_fields(self):
+        form_class = get_delete_form_class(Site, ModelForm)
+        self.assert_(not render_plan_form_class(form_class).base_fields)
+        self.assert_(render_plan_form_class(form_class)().as_table() == '')
+
+    def test_renderer_get_output_identical(self):
+        class TestRenderer(CreatePublicForm):
+            use_render_plans = True
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        expected = self.client.get(self.page._cached_url).content
+
+        self.create_pf_ct.variation = 'TestRenderer'
+        self.create_pf_ct.save()
+        self.assert_(self.client.get(self.page._cached_url).content == expected)
+
+
+class RecordingTemplates(DjangoTemplates):
+    loaded = []
+
+    def get_template(self, name):
+        self.loaded.append(name)
+        return super(RecordingTemplates, self).get_template(name)
+
+
+class TemplateBackendTest(CRUDTest):
+    form_template = """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
+
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                self.form_template)
+
+    def use_backend(self, backend):
+        from django.conf import settings as django_settings
+        django_settings.PUBLIC_FORMS_TEMPLATE_BACKEND = backend
+        settings._reset()
+
+    def tearDown(self):
+        from django.conf import settings as django_settings
+        if hasattr(django_settings, 'PUBLIC_FORMS_TEMPLATE_BACKEND'):
+            del django_settings.PUBLIC_FORMS_TEMPLATE_BACKEND
+            settings._reset()
+        super(TemplateBackendTest, self).tearDown()
+
+    def test_backend_from_dotted_path(self):
+        del RecordingTemplates.loaded[:]
+        self.setup_crud_page()
+        expected = self.client.get(self.page._cached_url).content
+        self.use_backend('%s.RecordingTemplates'%__name__)
+        self.assert_(self.client.get(self.page._cached_url).content == expected)
+        self.assert_('content/sites/site_create.html' in RecordingTemplates.loaded)
+
+    @unittest.skipIf(jinja2 is None, 'jinja2 is not installed')
+    def test_jinja2_finalize(self):
+        environment = jinja2.Environment(autoescape=True,
+                                         finalize=jinja2_finalize)
+        template = environment.from_string('{{ value }}')
+        self.assert_(template.render(value='<b>') == '&lt;b&gt;')
+        self.assert_(template.render(value=mark_safe('<b>')) == '<b>')
+        errors = ErrorList(['<wrong>'])
+        self.assert_(environment.from_string('{{ errors }}')\
+                        .render(errors=errors) == unicode(errors))
+
+    @unittest.skipIf(jinja2 is None, 'jinja2 is not installed')
+    def test_jinja2_context_functions_called(self):
+        template = Jinja2Template(jinja2.Environment().from_string(
+                        '{{ value }} {{ nested.value }} {{ method }}'))
+        self.assert_(template.render(Context({'value':lambda:'called',
+                                              'nested':{'value':lambda:1},
+                                              'method':lambda x:x})) \
+                        .startswith('called 1 <function'))
+
+    @unittest.skipIf(jinja2 is None, 'jinja2 is not installed')
+    def test_jinja2_templates(self):
+        self.form_template = """{{ action_title }}<form method='POST'>{{ form }}{% for formset in formsets %}{{ formset }}{% endfor %}<input type="submit" name="{{ form.submit_name }}"/>{{ public_form_content.region }}</form>"""
+        self.setup_crud_page()
+        data = {'test22_first_col_0-domain':'',
+                'test22_first_col_0-name':'<b>',
+                'test22_first_col_0_create':'submit'}
+        self.use_backend('jinja2')
+        content = self.client.post(self.page._cached_url, data=data).content
+        self.assert_('errorlist' in content)
+        self.assert_('value="&lt;b&gt;"' in content)
+        self.assert_('name="test22_first_col_0_create"' in content)
+        self.assert_('first_col</form>' in content)
+
+
+class CountingPresentation(BasePresentationPublicForm):
+    renders = []
+
+    def render(self, request, *args, **kwargs):
+        self.renders.append(request)
+        return super(CountingPresentation, self).render(request,
+                                                        *args, **kwargs)
+
+
+class FragmentCacheTest(CRUDTest):
+    def create_templates(self):
+        for action in ('create', 'update', 'delete'):        
+            self.setup_template('content/sites/site_%s.html'%action,
+                                """<form method='POST'>{{form}}<input type="submit" name="{{form.submit_name}}"/></form>"""
+                               )
+
+    def setUp(self):
+        super(FragmentCacheTest, self).setUp()
+        from django.core.cache.backends.locmem import LocMemCache
+        self.backend = LocMemCache('public_forms_fragments_tests', {})
+        self.orig_get_backend = fragment_cache.get_backend
+        fragment_cache.get_backend = lambda:self.backend
+        del CountingPresentation.renders[:]
+
+        class TestRenderer(UpdatePublicForm):
+            cache_presentation = True
+            presentation_class = CountingPresentation
+
+        pf_ct = module_content_type(Page, PublicForm)
+        self.orig_render = pf_ct.render
+        pf_ct.render = RendererSelectionWrapper([TestRenderer]+pf_ct.renderer_choices)
+        self.setup_crud_page()
+        self.update_pf_ct.variation = 'TestRenderer'
+        self.update_pf_ct.save()
+
+    def tearDown(self):
+        fragment_cache.get_backend = self.orig_get_backend
+        self.backend.clear()
+        super(FragmentCacheTest, self).tearDown()
+
+    def test_presentation_rendered_once(self):
+        content = self.client.get(self.page._cached_url).content
+        for i in xrange(3):
+            self.assert_(self.client.get(self.page._cached_url).content == \
+                            content)
+        self.assert_(len(CountingPresentation.renders) == 1)
+
+    def test_owner_not_cached(self):
+        self.client.get(self.page._cached_url)
+        response = self.client.post(self.page._cached_url,
+                            data={'test22_second_col_0-domain':'',
+                                  'test22_second_col_0-name':'b',
+                                  'test22_second_col_0_update':'submit'})
+        self.assert_('errorlist' in response.content)
+        self.assert_(len(CountingPresentation.renders) == 1)
+
+    def test_invalidated_on_object_save(self):
+        self.client.get(self.page._cached_url)
+        site = Site.objects.get(id=1)
+        site.name = 'fragment-cache-test'
+        site.save()
+        self.assert_('fragment-cache-test' in \
+                        self.client.get(self.page._cached_url).content)
+        self.assert_(len(CountingPresentation.renders) == 2)
+
+    def test_invalidated_on_public_form_save(self):
+        self.client.get(self.page._cached_url)
+        self.update_pf_ct.save()
+        self.client.get(self.page._cached_url)
+        self.assert_(len(CountingPresentation.renders) == 2)
+
+    def test_invalidated_on_proxy_save(self):
+        class ProxySite(Site):
+            class Meta:
+                proxy = True
+        self.client.get(self.page._cached_url)
+        proxy = ProxySite.objects.get(id=1)
+        proxy.name = 'fragment-cache-proxy'
+        proxy.save()
+        self.assert_('fragment-cache-proxy' in \
+                        self.client.get(self.page._cached_url).content)
+        self.assert_(len(CountingPresentation.renders) == 2)
+
+    def test_formsets_and_model_choices_not_cached(self):
+        from django import forms
+        class ChoiceForm(forms.Form):
+            group = forms.ModelChoiceField(queryset=Group.objects.all())
+        request = self.factory.get(self.page._cached_url)
+        rendered = []
+        render = lambda:rendered.append(1) or u'fragment'
+        for attr, value in (('inlines', [(Permission, {})]),
+                            ('get_form_class', lambda:ChoiceForm)):
+            presentation = self.update_pf_ct.render.presentation
+            setattr(presentation, attr, value)
+            for i in xrange(2):
+                fragment_cache.render(presentation, request, render)
+            delattr(presentation, attr)
+        self.assert_(len(rendered) == 4)
+
+    def test_keyed_on_language(self):
+        try:
+            for language in ('en', 'de', 'en'):
+                translation.activate(language)
+                request = self.factory.get(self.page._cached_url)
+                self.update_pf_ct.process(request)
+                self.update_pf_ct.render(request=request)
+        finally:
+            translation.deactivate()
+        self.assert_(len(CountingPresentation.renders) == 2)
+
+    def test_csrf_token_injected_after_lookup(self):
+        renderer = self.update_pf_ct.render
+        first, second = [self.factory.get(self.page._cached_url) \
+                            for i in xrange(2)]
+        first.META['CSRF_COOKIE'] = 'a'*32
+        second.META['CSRF_COOKIE'] = 'b'*32
+        render = lambda:u'<input value="%s"/>'%('a'*32)
+        self.assert_(fragment_cache.render(renderer.presentation, first,
+                                           render) == render())
+        self.assert_(fragment_cache.render(renderer.presentation, second,
+                                           render) == \
+                        u'<input value="%s"/>'%('b'*32))
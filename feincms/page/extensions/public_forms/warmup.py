@@ -0,0 +1,110 @@
+import gc
+import time
+
+from django.http import HttpRequest
+from django.contrib.auth.models import AnonymousUser
+
+from .content_types import content_types
+
+
+def iter_public_form_types():
+    from feincms.module.page.models import Page
+    from .models import PublicForm
+    for content_type in Page._feincms_content_types:
+        if issubclass(content_type, PublicForm):
+            yield content_type
+
+
+def iter_public_form_contents():
+    for content_type in iter_public_form_types():
+        for content in content_type.objects.select_related('parent').\
+                                order_by('parent', 'region', 'ordering'):
+            yield content
+
+
+def get_warm_up_request(page=None):
+    '''anonymous GET request, which makes every form a presentation one'''
+    request = HttpRequest()
+    request.method = 'GET'
+    request.user = AnonymousUser()
+    request.session = {}
+    if page is not None:
+        request._feincms_page = page
+    return request
+
+
+def warm_up_content_type(content_type):
+    for field_name in ('content_type', 'object_id'):
+        content_type._meta.get_field(field_name).get_default()
+
+
+def warm_up_content(content):
+    '''
+        drives content through the same process/render calls
+        feincms does for a page, so every lazily built artifact
+        (renderer, form and formset classes, templates) gets built
+    '''
+    request = get_warm_up_request(content.parent)
+    content.process(request)
+    content.render(request=request)
+
+
+def warm_up(raise_errors=False):
+    '''
+        prebuilds every public form content of every page,
+        could be called from wsgi module before serving requests:
+
+            application = WSGIHandler()
+            from feincms.page.extensions.public_forms.warmup import warm_up
+            warm_up()
+
+        returns list of (content, seconds spent, exception or None)
+    '''
+    report = []
+    content_types.load()
+    for content_type in iter_public_form_types():
+        warm_up_content_type(content_type)
+
+    for content in iter_public_form_contents():
+        started = time.time()
+        error = None
+        try:
+            warm_up_content(content)
+        except Exception, e:
+            if raise_errors:
+                raise
+            error = e
+        report += (content, time.time() - started, error),
+    return report
+
+
+def preload(raise_errors=True):
+    '''
+        warms up every public form in prefork master process,
+        so workers share built classes, templates and content types
+        with master instead of building private copies,
+        call it at the end of wsgi module loaded by master
+        (gunicorn --preload, uwsgi without lazy-apps):
+
+            application = WSGIHandler()
+            from feincms.page.extensions.public_forms.warmup import preload
+            preload()
+
+        garbage is collected before fork and (python>=3.7) survivors
+        are moved to permanent generation, so collector in workers
+        does not write to shared pages
+    '''
+    report = warm_up(raise_errors=raise_errors)
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+    return report
+
+
+def describe_content(content):
+    return u'%s #%s %s/%s/%s (%s)'%(content.__class__.__name__,
+                                     content.pk,
+                                     content.parent,
+                                     content.region,
+                                     content.ordering,
+                                     content.variation)
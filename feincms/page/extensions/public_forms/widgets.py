@@ -1,9 +1,12 @@
 from django import forms
-from django.template import RequestContext
-from django.template.loader import render_to_string
+from django.template import RequestContext, Context
+from django.template.context import BaseContext, get_standard_processors
 from django.utils.safestring import mark_safe
 
 from . import settings
+from .rendering import template_cache
+from .registry import registry
+from .request_state import RequestState
 
 class MixinBasedWidget(forms.widgets.Widget):
     def __init__(self, **kwargs):
@@ -13,30 +16,62 @@ class MixinBasedWidget(forms.widgets.Widget):
 
 
 class TemplateWidgetMixin(object):
+    #context processors (callables or dotted paths) the widget needs,
+    #None means every processor RequestContext would run
+    context_processors = None
+
     def get_template_names(self):
         if isinstance(self.templates, basestring):
             self.templates = [self.templates,]
         return self.templates
     
+    def get_context_processors(self):
+        if self.context_processors is None:
+            return get_standard_processors()
+        return [registry.resolve(processor) \
+                    if isinstance(processor, basestring) else processor \
+                        for processor in self.context_processors]
+
     def get_context_data(self):
-        if hasattr(self, 'request'):
-            context = RequestContext(self.request, self.__dict__)
-        else:
-            context = self.__dict__
+        if not hasattr(self, 'request'):
+            return self.__dict__
+        if self.context_processors is None \
+                and not settings.PUBLIC_FORMS_SHARED_WIDGET_CONTEXT:
+            return RequestContext(self.request, self.__dict__)
+
+        context = Context()
+        state = RequestState.for_request(self.request)
+        for processor in self.get_context_processors():
+            context.update(state.get_processor_context(processor,
+                                                       self.request))
+        #processors results are shared, widget variables override them
+        context.update(self.__dict__)
+        #template assignments must not leak into widget
+        context.push()
         return context
 
     def render(self, name, value, attrs=None):
-        return mark_safe(unicode(render_to_string(self.get_template_names(), 
-                                self.get_context_data())))
+        context = self.get_context_data()
+        if not isinstance(context, BaseContext):
+            context = Context(context)
+        return mark_safe(unicode(template_cache.select_template(
+                                self.get_template_names()).render(context)))
 
 class TemplateWidget(TemplateWidgetMixin, MixinBasedWidget):
     pass
 
 class AjaxInitWidget(TemplateWidgetMixin, MixinBasedWidget):
     is_hidden = True
-    class Media:
-        js = (settings.MOOTOOLS, 
-              settings.MOOTOOLS['forms'],
-              settings.STATIC_URL+'js/form_ajax_init.js')
-    
-    templates = [settings.CMS_PUBLIC_FORMS_AJAX_INIT_TEMPLATE,]
\ No newline at end of file
+    templates = None
+
+    def get_template_names(self):
+        if not self.templates:
+            return [settings.PUBLIC_FORMS_AJAX_INIT_TEMPLATE,]
+        return super(AjaxInitWidget, self).get_template_names()
+
+    @property
+    def media(self):
+        #built on access, so importing widgets does not need configured settings
+        return forms.Media(js=(settings.MOOTOOLS, 
+                               settings.MOOTOOLS['forms'],
+                               settings.STATIC_URL+'js/form_ajax_init.js'))
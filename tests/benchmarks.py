@@ -0,0 +1,60 @@
+import os
+import sys
+
+from utility import VirtualProjectTestCase, chdir
+
+IMPORT_BENCHMARK_SCRIPT = """
+import os
+import sys
+import time
+import resource
+
+module_name = sys.argv[1]
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.time()
+__import__(module_name)
+elapsed = time.time() - started
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print 'IMPORT %s %.6f %d %d'%(module_name, elapsed,
+                               rss_after - rss_before,
+                               'captcha' in sys.modules)
+"""
+
+class ImportCostBenchmark(VirtualProjectTestCase):
+    '''
+        measures cold import time and resident memory growth
+        of public_forms modules, each one in a fresh interpreter
+
+        limits could be relaxed for slow machines with
+        PUBLIC_FORMS_MAX_IMPORT_SECONDS and PUBLIC_FORMS_MAX_IMPORT_RSS_KB
+    '''
+    modules = ('feincms.page.extensions.public_forms',
+               'feincms.page.extensions.public_forms.widgets',
+               'feincms.page.extensions.public_forms.renderers',)
+    max_import_seconds = float(os.environ.get('PUBLIC_FORMS_MAX_IMPORT_SECONDS',
+                                              '1.0'))
+    max_import_rss_kb = int(os.environ.get('PUBLIC_FORMS_MAX_IMPORT_RSS_KB',
+                                           '20480'))
+
+    def import_cost(self, module_name):
+        script_path = os.path.join(self.testdir, 'import_benchmark.py')
+        with open(script_path, 'w') as script:
+            script.write(IMPORT_BENCHMARK_SCRIPT)
+
+        with chdir(os.path.join(self.testdir, self.project_package_name)):
+            out = self.command('DJANGO_SETTINGS_MODULE=settings python %s %s'%\
+                                    (script_path, module_name), output=True)
+        for line in ('%s'%out).splitlines():
+            if line.startswith('IMPORT '):
+                name, elapsed, rss, captcha_imported = line.split()[1:]
+                return float(elapsed), int(rss), bool(int(captcha_imported))
+        self.fail('benchmark script failed: %s'%out)
+
+    def test_import_cost(self):
+        for module_name in self.modules:
+            elapsed, rss, captcha_imported = self.import_cost(module_name)
+            sys.stdout.write('\n%s: %.4fs, +%dKb rss\n'%(module_name,
+                                                          elapsed, rss))
+            self.assert_(elapsed < self.max_import_seconds)
+            self.assert_(rss < self.max_import_rss_kb)
+            self.assert_(not captcha_imported)